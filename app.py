@@ -8,107 +8,622 @@ multi-perspective responses in Slack threads.
 
 import os
 import re
+import sys
+import atexit
+import logging
+import queue
+import json
 import asyncio
+import hashlib
 import random
-from typing import List, Dict, Any
+import ssl
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
+from typing import List, Dict, Any, Mapping, Optional, Awaitable, Tuple, NamedTuple
+import aiohttp
+import httpx
+import orjson
 from dotenv import load_dotenv
 from slack_bolt.async_app import AsyncApp
 from slack_bolt.adapter.socket_mode.async_handler import AsyncSocketModeHandler
 
-from llm_manager import LLMManager, LLMAdapter
+from llm_manager import LLMManager, LLMAdapter, ErrorResponse
 from context_filter import ContextFilter, create_default_system_prompt
 from mode_manager import ModeCommand
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+
+def setup_logging() -> QueueListener:
+    """
+    Route all log records through a queue drained by a background thread
+    
+    Handlers then never perform blocking writes on the event loop thread.
+    The level is taken from LOG_LEVEL (default INFO).
+    
+    Returns:
+        The started queue listener
+    """
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    
+    root_logger = logging.getLogger()
+    root_logger.addHandler(QueueHandler(log_queue))
+    root_logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+# Slack mentions look like "<@U12345> message text"
+_MENTION_RE = re.compile(r'<@[A-Z0-9]+>\s*')
+
+# Inline model selection, e.g. "model=GPT-4o" or "model=Grok,Gemini"
+_MODEL_ARG_RE = re.compile(r'model=([^\s]+)')
+
+# Fallback routes for follow-up action_ids and modal callback_ids
+_FOLLOWUP_ACTION_RE = re.compile(r"^followup_.*")
+_FOLLOWUP_MODAL_RE = re.compile(r"^followup_modal_.*")
+
 # Initialize Slack app
 app = AsyncApp(token=os.getenv("SLACK_BOT_TOKEN"))
 
+# One HTTP connection pool shared by every HTTP-based LLM adapter, so repeat
+# calls to the same provider skip the TCP/TLS handshake
+HTTP_CLIENT = httpx.AsyncClient(
+    limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+    timeout=httpx.Timeout(connect=5.0, read=60.0, write=10.0, pool=5.0)
+)
+
 # Initialize managers
-llm_manager = LLMManager()
+llm_manager = LLMManager(
+    http_client=HTTP_CLIENT,
+    # Optional cap on concurrent model calls across all providers (0 = none)
+    concurrency_limit=int(os.getenv("LLM_CONCURRENCY", "0"))
+)
 context_filter = None  # Will be initialized after getting bot user ID
 
-# Global cache for event deduplication
-processed_events = set()
+# Adapters are fixed once the manager is initialized, so resolve them once
+ADAPTERS = llm_manager.get_all_adapters()
+
+# Recently handled events (event key -> monotonic time seen), oldest first.
+# Slack retries deliveries it considers unacknowledged; a repeat within
+# EVENT_DEDUP_TTL would otherwise trigger a second full model fan-out.
+EVENT_DEDUP_SIZE = 4096
+EVENT_DEDUP_TTL = 300
+processed_events: "OrderedDict[str, float]" = OrderedDict()
+
+# Slack posts share one rate-limit bucket; LLM calls are bounded per provider
+# (and optionally overall) by llm_manager.request_slot
+SLACK_POST_SEM = asyncio.Semaphore(3)
+
+# Upper bound (seconds) a streamed model may go silent: the wait for its first
+# stream event and between events. Reasoning and search progress count, so a
+# model still thinking is not cut off. A straggler gets a "timed out" reply
+# instead of holding up the thread
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "45"))
+
+# Upper bound (seconds) on a single model's generation, counted from when it
+# holds a request slot so time queued behind provider limits never counts.
+# Non-streamed replies are bounded by this alone; a stream still running at
+# the cap keeps its partial text, marked as cut off
+MODEL_TASK_TIMEOUT = float(os.getenv("MODEL_TASK_TIMEOUT", "300"))
+
+# Stream responses into a placeholder message via chat.update; the update
+# interval keeps edits well under Slack's per-message rate limit
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "true").lower() in ("1", "true", "yes")
+STREAM_UPDATE_INTERVAL = 1.0
+# A burst of this many new characters flushes early, but never more often
+# than STREAM_MIN_UPDATE_INTERVAL
+STREAM_UPDATE_CHARS = 200
+STREAM_MIN_UPDATE_INTERVAL = 0.5
+STREAM_PLACEHOLDER_TEXT = "_思考中..._"
+# Posted when a model finishes without producing any text
+EMPTY_RESPONSE_TEXT = "(empty response)"
+
+# Maximum characters per section block
+RESPONSE_CHUNK_LIMIT = 2500
+
+# Follow-up button skeletons keyed by (adapter_key, username)
+_followup_button_templates: Dict[Tuple[str, str], Dict[str, Any]] = {}
 
+# Longest username that fits in a follow-up modal title after "追问 "
+FOLLOWUP_TITLE_USERNAME_MAX = 21
+
+# In-process LRU cache of model responses, keyed by adapter and prompt (opt-in)
+ENABLE_LLM_CACHE = os.getenv("ENABLE_LLM_CACHE", "false").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_SIZE = 512
+RESPONSE_CACHE_TTL = 300
+_response_cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+# In asyncio debug mode (PYTHONASYNCIODEBUG=1 or python -X dev), any callback
+# blocking the event loop longer than this many seconds is logged
+SLOW_CALLBACK_DURATION = 0.1
+
+# One TLS context for every Slack connection (Web API and Socket Mode
+# reconnects), built once instead of per handshake
+SLACK_SSL_CONTEXT = ssl.create_default_context()
+SLACK_SSL_CONTEXT.options |= getattr(ssl, "OP_NO_RENEGOTIATION", 0)
+
+# Recently fetched threads, kept current with the messages the bot posts so
+# back-to-back mentions in a thread skip conversations.replies
+THREAD_CACHE_TTL = 5.0
+
+# Page size for conversations.replies; longer threads are paginated
+THREAD_PAGE_SIZE = 100
+_thread_cache: Dict[Tuple[str, str], Tuple[float, List[Dict[str, Any]]]] = {}
+
+# Debate mode re-checks the thread for new human replies every N turns
+# (0 disables; turns otherwise only see the debate's own posts)
+DEBATE_REFRESH_EVERY = int(os.getenv("DEBATE_REFRESH_EVERY", "0"))
+
+# auth.test retries at startup, with exponential backoff starting at
+# AUTH_TEST_BACKOFF seconds
+AUTH_TEST_ATTEMPTS = 3
+AUTH_TEST_BACKOFF = 1.0
+
+# On-disk cache of the bot user ID, keyed by a hash of the bot token
+BOT_ID_CACHE_PATH = os.path.expanduser(os.getenv("BOT_ID_CACHE_PATH", "~/.cache/slack_bot_id"))
+
+
+def _token_fingerprint(token: str) -> str:
+    """Hash the bot token so it is never written to disk in clear text"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def load_cached_bot_user_id(token: Optional[str]) -> Optional[str]:
+    """
+    Load the bot user ID cached for this token, if any
+    
+    Args:
+        token: Slack bot token
+    
+    Returns:
+        Cached bot user ID, or None if missing or cached for another token
+    """
+    if not token:
+        return None
+    try:
+        with open(BOT_ID_CACHE_PATH, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cache, dict):
+        return None
+    return cache.get(_token_fingerprint(token))
+
+
+def store_cached_bot_user_id(token: Optional[str], bot_user_id: str):
+    """
+    Atomically persist the bot user ID for this token
+    
+    Args:
+        token: Slack bot token
+        bot_user_id: Bot user ID returned by auth.test
+    """
+    if not token:
+        return
+    tmp_path = f"{BOT_ID_CACHE_PATH}.tmp"
+    try:
+        os.makedirs(os.path.dirname(BOT_ID_CACHE_PATH) or ".", exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({_token_fingerprint(token): bot_user_id}, f)
+        os.replace(tmp_path, BOT_ID_CACHE_PATH)
+    except OSError as e:
+        logger.warning("⚠ Could not cache bot user ID: %s", e)
+
+
+def normalize_question(text: str) -> str:
+    """Collapse whitespace and trim trailing punctuation, which never change an answer"""
+    return " ".join(text.split()).rstrip("?!.？！。 ")
+
+
+def response_cache_key(adapter: LLMAdapter, messages: List[Dict[str, str]]) -> str:
+    """
+    Hash the adapter key and full prompt into a response cache key
+    
+    The latest user question is normalized, so rephrasings that differ only
+    in spacing or trailing punctuation share a cached response. Case is kept,
+    since it can change the meaning (acronyms, code identifiers, names).
+    """
+    if messages and messages[-1].get("role") == "user":
+        question = normalize_question(messages[-1].get("content", ""))
+        payload = [adapter.adapter_key, messages[:-1], question]
+    else:
+        payload = [adapter.adapter_key, messages]
+    return hashlib.blake2b(
+        orjson.dumps(payload, option=orjson.OPT_SORT_KEYS), digest_size=16
+    ).hexdigest()
+
+
+def get_cached_response(key: str) -> Optional[str]:
+    """
+    Look up a cached model response
+    
+    Args:
+        key: Cache key from response_cache_key
+    
+    Returns:
+        Cached response text, or None if missing or expired
+    """
+    entry = _response_cache.get(key)
+    if entry is None:
+        return None
+    stored_at, response = entry
+    if time.monotonic() - stored_at > RESPONSE_CACHE_TTL:
+        del _response_cache[key]
+        return None
+    _response_cache.move_to_end(key)
+    return response
+
+
+def store_cached_response(key: str, response: str):
+    """
+    Cache a model response, evicting the least recently used entry when full
+    
+    Args:
+        key: Cache key from response_cache_key
+        response: Response text to cache
+    """
+    # Adapters report failures as ErrorResponse text; never replay those,
+    # nor an empty or placeholder reply
+    if not response or isinstance(response, ErrorResponse):
+        return
+    if response.strip() in (EMPTY_RESPONSE_TEXT, STREAM_PLACEHOLDER_TEXT):
+        return
+    _response_cache[key] = (time.monotonic(), response)
+    _response_cache.move_to_end(key)
+    while len(_response_cache) > RESPONSE_CACHE_SIZE:
+        _response_cache.popitem(last=False)
+
+
+def is_duplicate_event(event_key: str) -> bool:
+    """
+    Record an event and report whether it was already seen recently
+    
+    Args:
+        event_key: Unique key of the event (client_msg_id or "channel:ts")
+    
+    Returns:
+        True if the event was seen within EVENT_DEDUP_TTL seconds
+    """
+    now = time.monotonic()
+    seen_at = processed_events.get(event_key)
+    if seen_at is not None and now - seen_at < EVENT_DEDUP_TTL:
+        return True
+    processed_events[event_key] = now
+    processed_events.move_to_end(event_key)
+    while len(processed_events) > EVENT_DEDUP_SIZE:
+        processed_events.popitem(last=False)
+    return False
+
+
+def orjson_dumps(obj: Any) -> str:
+    """Serialize Slack API payloads with orjson, much faster than json.dumps"""
+    return orjson.dumps(obj).decode("utf-8")
+
+
+class FollowupMeta(NamedTuple):
+    """Follow-up routing data carried by a button value or modal private_metadata"""
+    channel: str
+    thread_ts: str
+    model_key: Optional[str] = None
+
+
+def pack_followup_meta(channel: str, thread_ts: str, model_key: Optional[str] = None) -> str:
+    """
+    Encode follow-up routing data for a button value or modal private_metadata
+    
+    Args:
+        channel: Channel ID
+        thread_ts: Thread timestamp
+        model_key: Optional model key the follow-up is addressed to
+    
+    Returns:
+        Compact JSON string
+    """
+    meta = {"c": channel, "t": thread_ts}
+    if model_key:
+        meta["m"] = model_key
+    return orjson_dumps(meta)
+
+
+def unpack_followup_meta(value: str) -> FollowupMeta:
+    """
+    Decode follow-up routing data written by pack_followup_meta
+    
+    Buttons posted before the JSON encoding used "channel|thread_ts" and
+    modals "channel|thread_ts|model_key"; both are still accepted.
+    
+    Args:
+        value: Button value or modal private_metadata
+    
+    Returns:
+        FollowupMeta; model_key is None when the value carries none
+    
+    Raises:
+        ValueError: If the value is in neither format
+    """
+    if value.startswith("{"):
+        # orjson.JSONDecodeError is a ValueError subclass
+        meta = orjson.loads(value)
+        if not isinstance(meta, dict) or "c" not in meta or "t" not in meta:
+            raise ValueError(f"Invalid follow-up metadata: {value!r}")
+        return FollowupMeta(meta["c"], meta["t"], meta.get("m") or None)
+    
+    parts = value.split("|", 2)
+    if len(parts) < 2:
+        raise ValueError(f"Invalid follow-up metadata: {value!r}")
+    return FollowupMeta(*parts)
 
 
 async def initialize_context_filter():
     """Initialize context filter with bot user ID"""
     global context_filter
-    try:
-        auth_response = await app.client.auth_test()
-        bot_user_id = auth_response["user_id"]
-        context_filter = ContextFilter(bot_user_id, llm_manager)
-        print(f"✓ Context filter initialized with bot user ID: {bot_user_id}")
-    except Exception as e:
-        print(f"✗ Error initializing context filter: {e}")
-        # Create a fallback context filter
-        context_filter = ContextFilter("UNKNOWN", llm_manager)
+    token = os.getenv("SLACK_BOT_TOKEN")
+    
+    # Skip the auth.test round-trip when the ID is already cached for this token
+    cached_user_id = load_cached_bot_user_id(token)
+    if cached_user_id:
+        context_filter = ContextFilter(cached_user_id, llm_manager)
+        logger.info("✓ Context filter initialized with cached bot user ID: %s", cached_user_id)
+        return
+    
+    for attempt in range(1, AUTH_TEST_ATTEMPTS + 1):
+        try:
+            auth_response = await app.client.auth_test()
+            break
+        except Exception as e:
+            logger.error("✗ auth.test failed (attempt %d/%d): %s", attempt, AUTH_TEST_ATTEMPTS, e)
+            if attempt == AUTH_TEST_ATTEMPTS:
+                # Without the bot user ID every thread would be filtered wrongly
+                raise RuntimeError("Could not determine the bot user ID") from e
+            await asyncio.sleep(AUTH_TEST_BACKOFF * 2 ** (attempt - 1))
+    
+    bot_user_id = auth_response["user_id"]
+    context_filter = ContextFilter(bot_user_id, llm_manager)
+    store_cached_bot_user_id(token, bot_user_id)
+    logger.info("✓ Context filter initialized with bot user ID: %s", bot_user_id)
 
 
-async def fetch_thread_messages(channel: str, thread_ts: str) -> List[Dict[str, Any]]:
+async def fetch_replies(channel: str, thread_ts: str, **kwargs) -> List[Dict[str, Any]]:
     """
-    Fetch all messages from a thread
+    Fetch every page of conversations.replies for a thread
     
     Args:
         channel: Channel ID
         thread_ts: Thread timestamp
+        **kwargs: Extra conversations.replies arguments (e.g. oldest)
     
     Returns:
-        List of message objects
+        List of message objects across all pages
     """
-    try:
+    messages = []
+    cursor = None
+    while True:
         result = await app.client.conversations_replies(
             channel=channel,
             ts=thread_ts,
-            limit=100,
-            include_all_metadata=True
+            limit=THREAD_PAGE_SIZE,
+            include_all_metadata=True,
+            cursor=cursor,
+            **kwargs
         )
-        return result.get("messages", [])
+        messages.extend(result.get("messages", []))
+        cursor = (result.get("response_metadata") or {}).get("next_cursor")
+        if not cursor:
+            return messages
+
+
+async def fetch_thread_messages(
+    channel: str,
+    thread_ts: str,
+    latest_message: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Fetch all messages from a thread
+    
+    A thread fetched less than THREAD_CACHE_TTL seconds ago is served from
+    the cache, with latest_message (the message that triggered this call)
+    appended. Without latest_message the thread is always fetched.
+    
+    Args:
+        channel: Channel ID
+        thread_ts: Thread timestamp
+        latest_message: Optional triggering message, required for a cache hit
+    
+    Returns:
+        List of message objects
+    """
+    key = (channel, thread_ts)
+    now = time.monotonic()
+    cached = _thread_cache.get(key)
+    if latest_message is not None and cached is not None and now - cached[0] < THREAD_CACHE_TTL:
+        messages = cached[1]
+        if all(msg.get("ts") != latest_message.get("ts") for msg in messages):
+            messages.append(latest_message)
+        return list(messages)
+    
+    try:
+        messages = await fetch_replies(channel, thread_ts)
+    except Exception as e:
+        logger.error("Error fetching thread messages: %s", e)
+        return []
+    
+    # Drop expired threads so the cache stays bounded
+    for stale_key in [k for k, (fetched_at, _) in _thread_cache.items() if now - fetched_at >= THREAD_CACHE_TTL]:
+        del _thread_cache[stale_key]
+    _thread_cache[key] = (now, list(messages))
+    return messages
+
+
+async def fetch_new_thread_messages(
+    channel: str,
+    thread_ts: str,
+    known_messages: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Fetch only the thread messages posted after the newest known message
+    
+    Args:
+        channel: Channel ID
+        thread_ts: Thread timestamp
+        known_messages: Messages the caller already has
+    
+    Returns:
+        Messages not present in known_messages, in thread order
+    """
+    known_ts = {msg.get("ts") for msg in known_messages if msg.get("ts")}
+    oldest = max(known_ts, key=float, default=thread_ts)
+    try:
+        messages = await fetch_replies(channel, thread_ts, oldest=oldest)
     except Exception as e:
-        print(f"Error fetching thread messages: {e}")
+        logger.error("Error fetching new thread messages: %s", e)
         return []
+    return [msg for msg in messages if msg.get("ts") not in known_ts]
 
 
-def split_text(text: str, limit: int = 2500) -> List[str]:
+def seed_thread_messages(channel: str, thread_ts: str, messages: List[Dict[str, Any]]):
+    """
+    Cache a thread whose messages are already known without fetching it
+    
+    Args:
+        channel: Channel ID
+        thread_ts: Thread timestamp
+        messages: The thread's messages, shaped like conversations.replies entries
+    """
+    _thread_cache[(channel, thread_ts)] = (time.monotonic(), list(messages))
+
+
+def remember_thread_messages(channel: str, thread_ts: str, messages: List[Dict[str, Any]]):
+    """
+    Append messages the bot posted to a cached thread so it stays current
+    
+    Args:
+        channel: Channel ID
+        thread_ts: Thread timestamp
+        messages: Posted messages, shaped like conversations.replies entries
+    """
+    cached = _thread_cache.get((channel, thread_ts))
+    if cached is not None:
+        known_ts = {msg.get("ts") for msg in cached[1]}
+        cached[1].extend(msg for msg in messages if msg.get("ts") not in known_ts)
+
+
+def split_text(text: str, limit: int = RESPONSE_CHUNK_LIMIT) -> List[str]:
     """
     Split text into chunks of maximum limit characters.
     Tries to split at newlines or spaces to avoid breaking words.
     """
     chunks = []
-    while len(text) > limit:
+    # Walk the text by offset instead of re-slicing the remainder each pass
+    start, end = 0, len(text)
+    while end - start > limit:
+        stop = start + limit
         # Find a suitable split point (newline or space)
         # Look for the last newline within the limit
-        split_index = text.rfind('\n', 0, limit)
+        split_index = text.rfind('\n', start, stop)
         
         if split_index == -1:
             # If no newline, look for the last space
-            split_index = text.rfind(' ', 0, limit)
+            split_index = text.rfind(' ', start, stop)
         
         if split_index == -1:
             # No suitable split point, force split at limit
-            split_index = limit
+            split_index = stop
             
-        chunks.append(text[:split_index])
-        # Remove the split character (newline or space) if it was used
-        if split_index < len(text) and text[split_index] in ['\n', ' ']:
-            text = text[split_index+1:]
-        else:
-            text = text[split_index:]
+        chunks.append(text[start:split_index])
+        # Skip the split character (newline or space) if it was used
+        start = split_index + 1 if text[split_index] in '\n ' else split_index
         
-    if text:
-        chunks.append(text)
+    if start < end:
+        chunks.append(text[start:])
     return chunks
 
 
+def build_response_metadata(adapter: LLMAdapter) -> Dict[str, Any]:
+    """Build the message metadata used to attribute a post to its model"""
+    return {
+        "event_type": "ai_response",
+        "event_payload": {
+            "model_key": adapter.adapter_key,
+            "model_username": adapter.username
+        }
+    }
+
+
+def build_followup_actions(
+    adapter: LLMAdapter,
+    display_config: Mapping[str, str],
+    channel: str,
+    thread_ts: str
+) -> Dict[str, Any]:
+    """Build the actions block holding a model's follow-up button"""
+    # Everything but the value is static per adapter, so build it once
+    template_key = (adapter.adapter_key, display_config["username"])
+    button = _followup_button_templates.get(template_key)
+    if button is None:
+        button = _followup_button_templates[template_key] = {
+            "type": "button",
+            "text": {
+                "type": "plain_text",
+                "text": f"追问 {display_config['username']}",
+                "emoji": True
+            },
+            "action_id": f"followup_{adapter.adapter_key}"
+        }
+    return {
+        "type": "actions",
+        "elements": [{**button, "value": pack_followup_meta(channel, thread_ts)}]
+    }
+
+
+@lru_cache(maxsize=64)
+def followup_modal_title(username: str) -> str:
+    """
+    Build the follow-up modal title for a model username
+    
+    Slack requires title text to be strictly less than 25 characters;
+    "追问 " is 3 characters, leaving 21 for the username.
+    """
+    return f"追问 {username[:FOLLOWUP_TITLE_USERNAME_MAX]}"
+
+
+def build_response_blocks(
+    text: str,
+    followup_actions: Optional[Dict[str, Any]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Build the blocks for one chunk of a model response
+    
+    Args:
+        text: Chunk of response text
+        followup_actions: Optional actions block from build_followup_actions
+    
+    Returns:
+        List of Slack blocks
+    """
+    blocks = [{"type": "section", "text": {"type": "mrkdwn", "text": text}}]
+    if followup_actions is not None:
+        blocks.append(followup_actions)
+    return blocks
+
+
 async def send_model_response(
     channel: str,
     thread_ts: str,
     adapter: LLMAdapter,
-    response_text: str
-):
+    response_text: str,
+    placeholder_ts: Optional[str] = None
+) -> List[Dict[str, Any]]:
     """
     Send a response to Slack with custom username and icon, plus a follow-up button
     
@@ -117,65 +632,230 @@ async def send_model_response(
         thread_ts: Thread timestamp
         adapter: LLM adapter with display config
         response_text: Response text to send
+        placeholder_ts: Optional timestamp of a streaming placeholder message
+            to replace with the first chunk instead of posting a new one
+    
+    Returns:
+        List of posted messages, shaped like conversations.replies entries
     """
+    # Chunk index -> synthesized message, kept even if a later chunk fails
+    posted_by_index: Dict[int, Dict[str, Any]] = {}
     try:
         display_config = adapter.get_display_config()
+        username = display_config["username"]
+        icon_emoji = display_config["icon_emoji"]
         
         # Split text if it's too long for a single block
         chunks = split_text(response_text)
         
-        for i, chunk in enumerate(chunks):
+        # The button and metadata are identical for every chunk of a response
+        followup_actions = build_followup_actions(adapter, display_config, channel, thread_ts)
+        metadata = build_response_metadata(adapter)
+        
+        async def send_chunk(i: int):
+            chunk = chunks[i]
+            # Add follow-up button only to the last chunk
             is_last = (i == len(chunks) - 1)
+            blocks = build_response_blocks(chunk, followup_actions if is_last else None)
             
-            # Create blocks with response text
-            blocks = [
-                {
-                    "type": "section",
-                    "text": {
-                        "type": "mrkdwn",
-                        "text": chunk
-                    }
-                }
-            ]
-            
-            # Add follow-up button only to the last chunk
-            if is_last:
-                blocks.append({
-                    "type": "actions",
-                    "elements": [
-                        {
-                            "type": "button",
-                            "text": {
-                                "type": "plain_text",
-                                "text": f"追问 {display_config['username']}",
-                                "emoji": True
-                            },
-                            "action_id": f"followup_{adapter.adapter_key}",
-                            "value": f"{channel}|{thread_ts}"
-                        }
-                    ]
-                })
+            async with SLACK_POST_SEM:
+                if i == 0 and placeholder_ts:
+                    result = await app.client.chat_update(
+                        channel=channel,
+                        ts=placeholder_ts,
+                        text=chunk,
+                        blocks=blocks,
+                        metadata=metadata
+                    )
+                else:
+                    result = await app.client.chat_postMessage(
+                        channel=channel,
+                        thread_ts=thread_ts,
+                        text=chunk,  # Fallback text for notifications
+                        blocks=blocks,
+                        username=username,
+                        icon_emoji=icon_emoji,
+                        metadata=metadata
+                    )
             
-            # Add model information to metadata for filtering
-            metadata = {
-                "event_type": "ai_response",
-                "event_payload": {
-                    "model_key": adapter.adapter_key,
-                    "model_username": adapter.username
-                }
+            # Record the posted message so callers can extend their local
+            # copy of the thread without re-fetching it from Slack
+            posted = result.get("message") or {}
+            posted_by_index[i] = {
+                "type": "message",
+                "subtype": "bot_message",
+                "bot_id": posted.get("bot_id"),
+                "ts": result.get("ts") or posted.get("ts"),
+                "text": chunk,
+                "username": username,
+                "metadata": metadata
             }
-            
-            await app.client.chat_postMessage(
+        
+        async def post_in_order(start: int):
+            # New messages are ordered by arrival, so they go out one by one
+            for i in range(start, len(chunks)):
+                await send_chunk(i)
+        
+        if placeholder_ts:
+            # Editing the placeholder keeps its position in the thread, so it
+            # can overlap with posting the overflow chunks
+            await asyncio.gather(send_chunk(0), post_in_order(1))
+        else:
+            await post_in_order(0)
+    except Exception as e:
+        logger.error("Error sending message from %s: %s", adapter.username, e)
+    posted_messages = [posted_by_index[i] for i in sorted(posted_by_index)]
+    remember_thread_messages(channel, thread_ts, posted_messages)
+    return posted_messages
+
+
+def timeout_message(adapter: LLMAdapter, timeout: float) -> str:
+    """Build the reply posted when a model produces nothing within timeout seconds"""
+    return f"{adapter.username} timed out after {timeout:g}s. Please try again."
+
+
+def cut_off_message(adapter: LLMAdapter, partial: str) -> str:
+    """Build the final text of a streamed reply that stopped early, keeping its partial output"""
+    notice = f"_{adapter.username} stopped responding, so this answer may be incomplete._"
+    return f"{partial}\n\n{notice}" if partial else notice
+
+
+async def stream_model_response(
+    channel: str,
+    thread_ts: str,
+    adapter: LLMAdapter,
+    messages: List[Dict[str, str]],
+    cache_key: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Stream a model response into a placeholder message, then finalize it
+    
+    The placeholder is edited with the partial text once per
+    STREAM_UPDATE_INTERVAL, or sooner when STREAM_UPDATE_CHARS new characters
+    have arrived; once the stream ends it is replaced with the first chunk of
+    the final response and any remaining chunks are posted.
+    
+    LLM_TIMEOUT bounds the wait for each stream event, text or progress
+    (reasoning, search), and MODEL_TASK_TIMEOUT the whole stream once a
+    request slot is held.
+    A model cut off after producing output keeps its partial text, followed
+    by a notice. The placeholder is never left behind: if the task is
+    cancelled or fails, it is replaced with the partial text the same way.
+    
+    Args:
+        channel: Channel ID
+        thread_ts: Thread timestamp
+        adapter: LLM adapter to stream from
+        messages: Prompt messages for the model
+        cache_key: Optional response cache key to store the final text under
+    
+    Returns:
+        List of messages posted to the thread
+    """
+    display_config = adapter.get_display_config()
+    
+    async def post_placeholder() -> str:
+        async with SLACK_POST_SEM:
+            placeholder = await app.client.chat_postMessage(
                 channel=channel,
                 thread_ts=thread_ts,
-                text=chunk,  # Fallback text for notifications
-                blocks=blocks,
+                text=STREAM_PLACEHOLDER_TEXT,
                 username=display_config["username"],
                 icon_emoji=display_config["icon_emoji"],
-                metadata=metadata
+                metadata=build_response_metadata(adapter)
             )
-    except Exception as e:
-        print(f"Error sending message from {adapter.username}: {e}")
+        return placeholder["ts"]
+    
+    placeholder_task: Optional[asyncio.Task] = None
+    deltas = []
+    # Set when the adapter reports an error, possibly after partial output
+    failed = False
+    # The limit that cut the stream off, for the timeout notice
+    cut_off_after = LLM_TIMEOUT
+    
+    async def consume_stream() -> bool:
+        """Collect deltas into deltas; returns False if the model was cut off"""
+        nonlocal failed, cut_off_after
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + MODEL_TASK_TIMEOUT
+        last_update = time.monotonic()
+        pending_chars = 0
+        stream = adapter.stream_response(messages)
+        try:
+            while True:
+                try:
+                    delta = await asyncio.wait_for(
+                        stream.__anext__(), timeout=min(LLM_TIMEOUT, deadline - loop.time())
+                    )
+                except StopAsyncIteration:
+                    return True
+                except asyncio.TimeoutError:
+                    if loop.time() >= deadline:
+                        cut_off_after = MODEL_TASK_TIMEOUT
+                        logger.warning("✗ %s cut off after %gs", adapter.username, MODEL_TASK_TIMEOUT)
+                    else:
+                        logger.warning("✗ %s produced no output for %gs", adapter.username, LLM_TIMEOUT)
+                    return False
+                # An empty delta only marks progress; the wait above restarts
+                if not delta:
+                    continue
+                failed = failed or isinstance(delta, ErrorResponse)
+                deltas.append(delta)
+                pending_chars += len(delta)
+                elapsed = time.monotonic() - last_update
+                if elapsed < STREAM_UPDATE_INTERVAL and not (
+                    pending_chars >= STREAM_UPDATE_CHARS and elapsed >= STREAM_MIN_UPDATE_INTERVAL
+                ):
+                    continue
+                last_update += elapsed
+                pending_chars = 0
+                try:
+                    await app.client.chat_update(
+                        channel=channel,
+                        ts=await placeholder_task,
+                        text="".join(deltas)[:RESPONSE_CHUNK_LIMIT]
+                    )
+                except Exception as e:
+                    logger.warning("Error updating streamed message from %s: %s", adapter.username, e)
+        finally:
+            await stream.aclose()
+    
+    async def abandon_placeholder():
+        try:
+            placeholder_ts = await placeholder_task
+        except Exception:
+            return
+        await send_model_response(
+            channel, thread_ts, adapter, cut_off_message(adapter, "".join(deltas)), placeholder_ts
+        )
+    
+    try:
+        async with llm_manager.request_slot(adapter):
+            # Post the placeholder once the request can start, so a model
+            # queued behind its provider limit shows nothing yet; the Slack
+            # round-trip still overlaps the model's time to first token
+            placeholder_task = asyncio.create_task(post_placeholder())
+            completed = await consume_stream()
+        placeholder_ts = await placeholder_task
+    except (Exception, asyncio.CancelledError):
+        # Never leave "thinking" behind, whether the task failed or was cancelled
+        if placeholder_task is not None:
+            await abandon_placeholder()
+        raise
+    finally:
+        if placeholder_task is not None and not placeholder_task.done():
+            placeholder_task.cancel()
+    
+    partial = "".join(deltas)
+    if not completed:
+        response = cut_off_message(adapter, partial) if partial else timeout_message(adapter, cut_off_after)
+        return await send_model_response(channel, thread_ts, adapter, response, placeholder_ts)
+    
+    # A stream that ended in an error is never cached, even with partial text
+    if cache_key and partial and not failed:
+        store_cached_response(cache_key, partial)
+    response = partial or EMPTY_RESPONSE_TEXT
+    return await send_model_response(channel, thread_ts, adapter, response, placeholder_ts)
 
 
 async def process_model_response(
@@ -184,8 +864,9 @@ async def process_model_response(
     thread_ts: str,
     thread_messages: List[Dict[str, Any]],
     mode: str,
-    role: str = None
-):
+    role: str = None,
+    prepared_context: Optional[List[Dict[str, Any]]] = None
+) -> List[Dict[str, Any]]:
     """
     Process and send response from a single AI model
     
@@ -196,36 +877,124 @@ async def process_model_response(
         thread_messages: List of thread messages
         mode: Current operation mode
         role: Optional role for debate mode
+        prepared_context: Optional context from context_filter.prepare_context,
+            shared across models answering the same thread
+    
+    Returns:
+        List of messages posted to the thread
     """
     try:
+        if prepared_context is None:
+            prepared_context = context_filter.prepare_context(thread_messages)
+        
         # Build prompt with filtered context
         system_prompt = create_default_system_prompt(adapter.username, mode, role)
-        messages = context_filter.build_prompt_with_context(
-            thread_messages,
+        messages = context_filter.build_prompt_from_prepared(
+            prepared_context,
             adapter.username,
             system_prompt,
             mode
         )
         
-        # Log messages being sent to the model
-        print(f"\n=== Sending messages to {adapter.username} ===")
-        for msg in messages:
-            role = msg.get('role', 'unknown')
-            content = msg.get('content', '(no content)')
-            print(f"[{role}]: {content}")
-        print("========================================\n")
+        # Log messages being sent to the model, skipping the loop unless debug is on
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("=== Sending messages to %s ===", adapter.username)
+            for msg in messages:
+                logger.debug("[%s]: %s", msg.get('role', 'unknown'), msg.get('content', '(no content)'))
 
-        # Generate response
-        response = await adapter.generate_response(messages)
-        
-        # Send to Slack
-        await send_model_response(channel, thread_ts, adapter, response)
+        cache_key = response_cache_key(adapter, messages) if ENABLE_LLM_CACHE else None
+        cached_response = get_cached_response(cache_key) if cache_key else None
+        if cached_response is not None:
+            logger.info("✓ %s response served from cache", adapter.username)
+            posted_messages = await send_model_response(channel, thread_ts, adapter, cached_response)
+        elif STREAM_RESPONSES and adapter.supports_streaming:
+            posted_messages = await stream_model_response(
+                channel, thread_ts, adapter, messages, cache_key
+            )
+        else:
+            # Generate response
+            try:
+                async with llm_manager.request_slot(adapter):
+                    response = await asyncio.wait_for(
+                        adapter.generate_response(messages),
+                        timeout=MODEL_TASK_TIMEOUT
+                    )
+            except asyncio.TimeoutError:
+                logger.warning("✗ %s timed out after %gs", adapter.username, MODEL_TASK_TIMEOUT)
+                return await send_model_response(
+                    channel, thread_ts, adapter, timeout_message(adapter, MODEL_TASK_TIMEOUT)
+                )
+            if cache_key:
+                store_cached_response(cache_key, response)
+            
+            # Send to Slack
+            posted_messages = await send_model_response(channel, thread_ts, adapter, response)
         
-        print(f"✓ {adapter.username} responded in thread {thread_ts}")
+        logger.info("✓ %s responded in thread %s", adapter.username, thread_ts)
+        return posted_messages
     except Exception as e:
         error_message = f"Error processing response: {str(e)}"
-        print(f"✗ {adapter.username} error: {error_message}")
-        await send_model_response(channel, thread_ts, adapter, error_message)
+        logger.error("✗ %s error: %s", adapter.username, error_message)
+        return await send_model_response(channel, thread_ts, adapter, error_message)
+
+
+async def _run_model_task(adapter: LLMAdapter, coro: Awaitable):
+    """
+    Run a single model task, logging its failure without affecting siblings
+    
+    Time limits are applied inside the task once it holds a request slot
+    (LLM_TIMEOUT and MODEL_TASK_TIMEOUT), so a task queued behind its
+    provider limit is never cut off before it starts.
+    
+    Args:
+        adapter: LLM adapter the task belongs to
+        coro: Coroutine generating and posting the model response
+    """
+    try:
+        await coro
+    except Exception as e:
+        logger.error("✗ %s task error: %s", adapter.username, e)
+
+
+async def run_model_tasks(jobs: List[Tuple[LLMAdapter, Awaitable]]):
+    """
+    Run model tasks concurrently with structured cancellation
+    
+    If the caller is cancelled, all in-flight model requests are cancelled
+    too instead of running on and burning tokens. Errors in one task are
+    logged and never cancel the others.
+    
+    Args:
+        jobs: List of (adapter, coroutine) pairs
+    """
+    if sys.version_info >= (3, 11):
+        async with asyncio.TaskGroup() as tg:
+            for adapter, coro in jobs:
+                tg.create_task(_run_model_task(adapter, coro))
+    else:
+        await asyncio.gather(*(_run_model_task(adapter, coro) for adapter, coro in jobs))
+
+
+async def _ensure_adapters_or_notify(
+    channel: str,
+    thread_ts: str,
+    specific_adapters: Optional[List[LLMAdapter]] = None
+) -> Optional[Tuple[LLMAdapter, ...]]:
+    """
+    Resolve the adapters for a request, telling the thread when there are none
+    
+    Returns:
+        The adapters to use, or None after posting the "not configured" notice
+    """
+    adapters = tuple(specific_adapters) if specific_adapters else ADAPTERS
+    if adapters:
+        return adapters
+    await app.client.chat_postMessage(
+        channel=channel,
+        thread_ts=thread_ts,
+        text="No AI models are configured. Please check your API keys."
+    )
+    return None
 
 
 async def handle_compare_mode(
@@ -243,36 +1012,36 @@ async def handle_compare_mode(
         thread_messages: List of thread messages
         specific_adapters: Optional list of specific adapters to use
     """
-    adapters = specific_adapters if specific_adapters else llm_manager.get_all_adapters()
-    
-    if not adapters:
-        await app.client.chat_postMessage(
-            channel=channel,
-            thread_ts=thread_ts,
-            text="No AI models are configured. Please check your API keys."
-        )
+    adapters = await _ensure_adapters_or_notify(channel, thread_ts, specific_adapters)
+    if adapters is None:
         return
     
+    # Clean the thread once and share it across all models
+    prepared_context = context_filter.prepare_context(thread_messages)
+    
     # Process all models concurrently
-    tasks = [
-        process_model_response(
+    await run_model_tasks([
+        (
             adapter,
-            channel,
-            thread_ts,
-            thread_messages,
-            "compare"
+            process_model_response(
+                adapter,
+                channel,
+                thread_ts,
+                thread_messages,
+                "compare",
+                prepared_context=prepared_context
+            )
         )
         for adapter in adapters
-    ]
-    
-    await asyncio.gather(*tasks, return_exceptions=True)
+    ])
 
 
 async def handle_debate_mode(
     channel: str,
     thread_ts: str,
     thread_messages: List[Dict[str, Any]],
-    specific_adapters: List[LLMAdapter] = None
+    specific_adapters: List[LLMAdapter] = None,
+    refresh_every: Optional[int] = None
 ):
     """
     Handle message in Debate mode (sequential responses)
@@ -282,15 +1051,13 @@ async def handle_debate_mode(
         thread_ts: Thread timestamp
         thread_messages: List of thread messages
         specific_adapters: Optional list of specific adapters to use
+        refresh_every: Fetch new human replies every N turns (0 disables);
+            defaults to DEBATE_REFRESH_EVERY
     """
-    adapters = specific_adapters if specific_adapters else llm_manager.get_all_adapters()
-    
-    if not adapters:
-        await app.client.chat_postMessage(
-            channel=channel,
-            thread_ts=thread_ts,
-            text="No AI models are configured. Please check your API keys."
-        )
+    if refresh_every is None:
+        refresh_every = DEBATE_REFRESH_EVERY
+    adapters = await _ensure_adapters_or_notify(channel, thread_ts, specific_adapters)
+    if adapters is None:
         return
 
     if len(adapters) < 2:
@@ -301,13 +1068,9 @@ async def handle_debate_mode(
         )
         return
     
-    # Shuffle adapters for random order
-    random.shuffle(adapters)
+    # Pick up to 5 models in random order (without mutating the caller's list)
+    adapters = random.sample(adapters, min(len(adapters), 5))
     
-    # Limit to 5 models if more are present
-    if len(adapters) > 5:
-        adapters = adapters[:5]
-        
     count = len(adapters)
     debate_plan = []
     
@@ -344,19 +1107,31 @@ async def handle_debate_mode(
             (adapters[4], "Judge")
         ]
     
-    # Process models sequentially according to plan
-    for adapter, role in debate_plan:
-        # Fetch updated thread messages before each response
-        updated_messages = await fetch_thread_messages(channel, thread_ts)
+    # Process models sequentially according to plan. Instead of re-fetching
+    # the whole thread before every turn, extend a local copy with the
+    # messages each model posts and prepare only the new messages.
+    # Bind the filter locally; it is set once at startup and never replaced
+    cf = context_filter
+    updated_messages = list(thread_messages)
+    prepared_context = cf.prepare_context(thread_messages)
+    for turn, (adapter, role) in enumerate(debate_plan):
+        if refresh_every and turn and turn % refresh_every == 0:
+            # Pick up replies posted by people since the debate started
+            new_messages = await fetch_new_thread_messages(channel, thread_ts, updated_messages)
+            updated_messages.extend(new_messages)
+            prepared_context = prepared_context + cf.prepare_context(new_messages)
         
-        await process_model_response(
+        posted_messages = await process_model_response(
             adapter,
             channel,
             thread_ts,
             updated_messages,
             "debate",
-            role
+            role,
+            prepared_context=prepared_context
         )
+        updated_messages.extend(posted_messages)
+        prepared_context = prepared_context + cf.prepare_context(posted_messages)
 
 
 
@@ -380,13 +1155,7 @@ async def handle_thread_reply(
         mode: Operation mode ("compare" or "debate")
     """
     # Get adapters for models that have participated in the thread
-    adapters = []
-    for model_key in models_in_thread:
-        try:
-            adapter = llm_manager.get_adapter(model_key)
-            adapters.append(adapter)
-        except KeyError:
-            print(f"Warning: Model {model_key} not found in available adapters")
+    adapters = llm_manager.get_adapters(models_in_thread)
     
     if not adapters:
         await app.client.chat_postMessage(
@@ -399,17 +1168,21 @@ async def handle_thread_reply(
     # Process based on mode
     if mode == "compare":
         # Process all participating models concurrently
-        tasks = [
-            process_model_response(
+        prepared_context = context_filter.prepare_context(thread_messages)
+        await run_model_tasks([
+            (
                 adapter,
-                channel,
-                thread_ts,
-                thread_messages,
-                "compare"
+                process_model_response(
+                    adapter,
+                    channel,
+                    thread_ts,
+                    thread_messages,
+                    "compare",
+                    prepared_context=prepared_context
+                )
             )
             for adapter in adapters
-        ]
-        await asyncio.gather(*tasks, return_exceptions=True)
+        ])
     elif mode == "debate":
         # Use the standardized debate handler
         await handle_debate_mode(
@@ -443,7 +1216,6 @@ async def handle_request_by_mode(
         await handle_debate_mode(channel, thread_ts, thread_messages, specific_adapters)
 
 
-@app.action(re.compile(r"^followup_.*"))
 async def handle_followup_button(ack, body, client):
     """
     Handle follow-up button clicks
@@ -459,16 +1231,12 @@ async def handle_followup_button(ack, body, client):
         # Extract action information
         action = body["actions"][0]
         action_id = action["action_id"]
-        value = action["value"]  # Format: "channel|thread_ts"
         
         # Parse model key from action_id (format: "followup_modelkey")
         model_key = action_id.replace("followup_", "")
         
         # Parse channel and thread_ts from value safely
-        parts = value.split("|")
-        if len(parts) != 2:
-            raise ValueError(f"Unexpected follow-up button value format: {value!r}")
-        channel, thread_ts = parts
+        channel, thread_ts, _ = unpack_followup_meta(action["value"])
         
         # Get the adapter for this model
         try:
@@ -482,14 +1250,6 @@ async def handle_followup_button(ack, body, client):
             )
             return
         
-        # Truncate username for modal title to fit Slack's character limit
-        # Slack requires title text to be strictly less than 25 characters
-        # "追问 " is 3 characters, leaving 21 for the username
-        max_username_length = 21
-        display_username = adapter.username
-        if len(display_username) > max_username_length:
-            display_username = display_username[:max_username_length]
-        
         # Open modal for follow-up question
         await client.views_open(
             trigger_id=body["trigger_id"],
@@ -498,7 +1258,7 @@ async def handle_followup_button(ack, body, client):
                 "callback_id": f"followup_modal_{model_key}",
                 "title": {
                     "type": "plain_text",
-                    "text": f"追问 {display_username}"
+                    "text": followup_modal_title(adapter.username)
                 },
                 "submit": {
                     "type": "plain_text",
@@ -536,14 +1296,13 @@ async def handle_followup_button(ack, body, client):
                         ]
                     }
                 ],
-                "private_metadata": f"{channel}|{thread_ts}|{model_key}"
+                "private_metadata": pack_followup_meta(channel, thread_ts, model_key)
             }
         )
     except Exception as e:
-        print(f"Error in handle_followup_button: {e}")
+        logger.exception("Error in handle_followup_button: %s", e)
 
 
-@app.view(re.compile(r"^followup_modal_.*"))
 async def handle_followup_modal_submission(ack, body, client, view):
     """
     Handle follow-up modal submission
@@ -573,12 +1332,11 @@ async def handle_followup_modal_submission(ack, body, client, view):
         # Acknowledge successful submission
         await ack()
         
-        # Parse metadata (expected format: "channel|thread_ts|model_key")
+        # Parse metadata written by handle_followup_button
         metadata = view["private_metadata"]
-        parts = metadata.split("|", 2)
-        if len(parts) != 3:
+        channel, thread_ts, model_key = unpack_followup_meta(metadata)
+        if not model_key:
             raise ValueError(f"Invalid private_metadata format: {metadata!r}")
-        channel, thread_ts, model_key = parts
         
         # Get user info
         user_id = body["user"]["id"]
@@ -586,22 +1344,6 @@ async def handle_followup_modal_submission(ack, body, client, view):
         # Get the adapter for this model
         try:
             adapter = llm_manager.get_adapter(model_key)
-            # Post the follow-up question to the thread (for visibility)
-            # Include the model name to show which model is being asked
-            await client.chat_postMessage(
-                channel=channel,
-                thread_ts=thread_ts,
-                text=f"<@{user_id}> 追问 {adapter.username}: {question}",
-                metadata={
-                    "event_type": "slack_ai_council_echo",
-                    "event_payload": {
-                        "is_user_question": True,
-                        "user_id": user_id,
-                        "question": question,
-                        "target_model_key": model_key
-                    }
-                }
-            )
         except KeyError:
             # Post the question without model name if adapter lookup fails
             await client.chat_postMessage(
@@ -625,8 +1367,40 @@ async def handle_followup_modal_submission(ack, body, client, view):
             )
             return
         
-        # Fetch thread messages including the new question
-        thread_messages = await fetch_thread_messages(channel, thread_ts)
+        # Post the follow-up question to the thread (for visibility)
+        # Include the model name to show which model is being asked
+        echo_text = f"<@{user_id}> 追问 {adapter.username}: {question}"
+        echo_metadata = {
+            "event_type": "slack_ai_council_echo",
+            "event_payload": {
+                "is_user_question": True,
+                "user_id": user_id,
+                "question": question,
+                "target_model_key": model_key
+            }
+        }
+        
+        # Fetch the thread while the question is being posted, then append
+        # the question locally in case the fetch raced ahead of the post
+        echo, thread_messages = await asyncio.gather(
+            client.chat_postMessage(
+                channel=channel,
+                thread_ts=thread_ts,
+                text=echo_text,
+                metadata=echo_metadata
+            ),
+            fetch_thread_messages(channel, thread_ts)
+        )
+        echo_message = {
+            "type": "message",
+            "bot_id": (echo.get("message") or {}).get("bot_id"),
+            "ts": echo.get("ts"),
+            "text": echo_text,
+            "metadata": echo_metadata
+        }
+        if all(msg.get("ts") != echo_message["ts"] for msg in thread_messages):
+            thread_messages.append(echo_message)
+        remember_thread_messages(channel, thread_ts, [echo_message])
         
         # Process the follow-up with only the specified model
         await process_model_response(
@@ -638,7 +1412,7 @@ async def handle_followup_modal_submission(ack, body, client, view):
         )
         
     except Exception as e:
-        print(f"Error in handle_followup_modal_submission: {e}")
+        logger.exception("Error in handle_followup_modal_submission: %s", e)
         # Try to send error message to thread if possible
         if channel is not None and thread_ts is not None:
             try:
@@ -649,7 +1423,17 @@ async def handle_followup_modal_submission(ack, body, client, view):
                 )
             except Exception as notify_error:
                 # Swallow secondary notification errors to avoid masking the original exception
-                print(f"Failed to send error notification to Slack: {notify_error}")
+                logger.error("Failed to send error notification to Slack: %s", notify_error)
+
+
+# Route each configured model's button and modal by exact id, so Bolt compares
+# strings instead of running a regex per event. The patterns are registered
+# last and only catch buttons posted for models that are no longer configured.
+for _adapter in ADAPTERS:
+    app.action(f"followup_{_adapter.adapter_key}")(handle_followup_button)
+    app.view(f"followup_modal_{_adapter.adapter_key}")(handle_followup_modal_submission)
+app.action(_FOLLOWUP_ACTION_RE)(handle_followup_button)
+app.view(_FOLLOWUP_MODAL_RE)(handle_followup_modal_submission)
 
 
 def extract_target_model(text: str) -> tuple[str, List[str]]:
@@ -664,24 +1448,20 @@ def extract_target_model(text: str) -> tuple[str, List[str]]:
         target_model_usernames is empty list if not specified
     """
     target_models = []
-    cleaned_text = text
+    if "model=" not in text:
+        return text, target_models
     
-    # Find all occurrences of model=...
-    # We use a while loop to find and remove them one by one
-    while True:
-        match = re.search(r'model=([^\s]+)', cleaned_text)
-        if not match:
-            break
-            
-        models_str = match.group(1)
+    def collect(match: re.Match) -> str:
         # Split by comma for cases like model=Grok,Gemini
-        found_models = [m.strip() for m in models_str.split(',') if m.strip()]
-        target_models.extend(found_models)
-        
-        # Remove the matched part from text
-        cleaned_text = cleaned_text.replace(match.group(0), "", 1).strip()
-        
-    return cleaned_text, target_models
+        target_models.extend(m.strip() for m in match.group(1).split(',') if m.strip())
+        return ""
+    
+    # Collect and remove every model=... in a single pass
+    cleaned_text, count = _MODEL_ARG_RE.subn(collect, text)
+    if not count:
+        return text, target_models
+    
+    return cleaned_text.strip(), target_models
 
 
 @app.event("app_mention")
@@ -697,23 +1477,17 @@ async def handle_app_mention(event, say):
         channel = event["channel"]
         event_ts = event["ts"]
         
-        # Deduplication check
-        event_key = f"{channel}:{event_ts}"
-        if event_key in processed_events:
-            print(f"Skipping duplicate event: {event_key}")
+        # Deduplication check, preferring Slack's own idempotency id
+        event_key = event.get("client_msg_id") or f"{channel}:{event_ts}"
+        if is_duplicate_event(event_key):
+            logger.debug("Skipping duplicate event: %s", event_key)
             return
         
-        processed_events.add(event_key)
-        # Simple cleanup to prevent memory leak
-        if len(processed_events) > 1000:
-            processed_events.pop()
-            
         thread_ts = event.get("thread_ts")
         text = event.get("text", "")
         
         # Remove bot mention from text for parsing
-        # Slack mentions look like "<@U12345> message text"
-        text_without_mention = re.sub(r'<@[A-Z0-9]+>\s*', '', text, count=1).strip()
+        text_without_mention = _MENTION_RE.sub('', text, count=1).strip()
         
         # Extract target model if specified
         text_without_mention, target_model_usernames = extract_target_model(text_without_mention)
@@ -725,26 +1499,17 @@ async def handle_app_mention(event, say):
         # Check if we have specific target models
         target_adapters = []
         if target_model_usernames:
-            username_mapping = llm_manager.get_username_mapping()
-            
             for target_model_username in target_model_usernames:
-                # Try exact match first
-                adapter_key = username_mapping.get(target_model_username)
-                
-                if not adapter_key:
-                    # Try case-insensitive match
-                    target_lower = target_model_username.lower()
-                    for username, key in username_mapping.items():
-                        if username.lower() == target_lower:
-                            adapter_key = key
-                            break
+                # Exact match first, then case-insensitive
+                adapter_key = llm_manager.find_adapter_key(target_model_username)
                 
                 if adapter_key:
                     target_adapters.append(llm_manager.get_adapter(adapter_key))
                 else:
                     # If specified model not found, warn user
+                    available = ", ".join(llm_manager.get_username_mapping().keys())
                     await say(
-                        text=f"找不到指定的模型 '{target_model_username}'。可用模型: {', '.join(username_mapping.keys())}",
+                        text=f"找不到指定的模型 '{target_model_username}'。可用模型: {available}",
                         thread_ts=thread_ts or event_ts
                     )
                     return
@@ -752,9 +1517,12 @@ async def handle_app_mention(event, say):
         # Check if this is a new channel message or a thread reply
         if thread_ts is None:
             # This is a new message in the channel, start a new conversation
-            print(f"New channel message, starting new conversation in thread {event_ts}")
+            logger.info("New channel message, starting new conversation in thread %s", event_ts)
             thread_ts = event_ts
-            thread_messages = await fetch_thread_messages(channel, thread_ts)
+            # The thread has no replies yet, so the event is the whole thread;
+            # skip the conversations.replies round-trip
+            thread_messages = [event]
+            seed_thread_messages(channel, thread_ts, thread_messages)
             
             if target_adapters:
                 # Handle with only the specified models
@@ -764,8 +1532,8 @@ async def handle_app_mention(event, say):
                 await handle_request_by_mode(request_mode, channel, thread_ts, thread_messages)
         else:
             # This is a reply in an existing thread
-            print(f"Reply in existing thread {thread_ts}, filtering by models")
-            thread_messages = await fetch_thread_messages(channel, thread_ts)
+            logger.info("Reply in existing thread %s, filtering by models", thread_ts)
+            thread_messages = await fetch_thread_messages(channel, thread_ts, event)
             
             if target_adapters:
                 # User explicitly requested models in the thread
@@ -773,11 +1541,11 @@ async def handle_app_mention(event, say):
             else:
                 # Get models that have already participated in this thread
                 models_in_thread = context_filter.get_models_in_thread(thread_messages)
-                print(f"Models in thread: {models_in_thread}")
+                logger.info("Models in thread: %s", models_in_thread)
                 
                 if not models_in_thread:
                     # No AI models have responded yet, treat as new conversation
-                    print("No models found in thread, starting new conversation")
+                    logger.info("No models found in thread, starting new conversation")
                     await handle_request_by_mode(request_mode, channel, thread_ts, thread_messages)
                 else:
                     # Filter and forward to only the models that have participated
@@ -790,7 +1558,7 @@ async def handle_app_mention(event, say):
                     )
     
     except Exception as e:
-        print(f"Error in handle_app_mention: {e}")
+        logger.exception("Error in handle_app_mention: %s", e)
         await say(
             text=f"Error processing request: {str(e)}",
             thread_ts=event.get("thread_ts", event["ts"])
@@ -799,22 +1567,60 @@ async def handle_app_mention(event, say):
 
 async def main():
     """Main function to start the bot"""
-    # Initialize context filter
+    asyncio.get_running_loop().slow_callback_duration = SLOW_CALLBACK_DURATION
+    
+    # Initialize context filter before the Socket Mode handler starts, so no
+    # event can be dispatched while context_filter is still None
     await initialize_context_filter()
     
     # Print configuration
-    print("\n" + "="*50)
-    print("Slack AI Council Bot Starting")
-    print("="*50)
-    print(f"Configured AI Models: {', '.join(llm_manager.get_adapter_names())}")
-    print(f"Default Mode: COMPARE")
-    print(f"Use 'mode=debate' inline to switch to debate mode for individual requests")
-    print("="*50 + "\n")
-    
-    # Start Socket Mode handler
+    logger.info("=" * 50)
+    logger.info("Slack AI Council Bot Starting")
+    logger.info("=" * 50)
+    logger.info("Configured AI Models: %s", ", ".join(llm_manager.get_adapter_names()))
+    logger.info("Default Mode: COMPARE")
+    logger.info("Use 'mode=debate' inline to switch to debate mode for individual requests")
+    logger.info("=" * 50)
+    
+    # Route every Slack Web API call through one keep-alive session that
+    # serializes payloads with orjson; without a session, slack_sdk opens a
+    # new one per request
+    slack_session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            ssl=SLACK_SSL_CONTEXT,
+            limit=64,
+            limit_per_host=16,
+            ttl_dns_cache=300
+        ),
+        timeout=aiohttp.ClientTimeout(total=app.client.timeout),
+        json_serialize=orjson_dumps
+    )
+    app.client.session = slack_session
+    # Socket Mode reconnects reuse the Web API client's TLS context
+    app.client.ssl = SLACK_SSL_CONTEXT
+    
+    # Start Socket Mode handler (auto-reconnect is on by default)
     handler = AsyncSocketModeHandler(app, os.getenv("SLACK_APP_TOKEN"))
-    await handler.start_async()
+    # Warm up the model clients in the background, so Socket Mode connects
+    # without waiting on slow or unreachable provider endpoints
+    warmup_task = asyncio.create_task(llm_manager.warmup_all())
+    try:
+        await handler.start_async()
+    finally:
+        warmup_task.cancel()
+        await slack_session.close()
+        await llm_manager.aclose()
+        await HTTP_CLIENT.aclose()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    # Configured only when run as a script, so importing app (e.g. from
+    # tests) never installs handlers or starts the listener thread
+    setup_logging()
+    try:
+        # libuv-based event loop; not available on Windows
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
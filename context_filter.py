@@ -8,18 +8,38 @@ ensuring each model only sees:
 """
 
 import re
+import string
+from functools import lru_cache
 from typing import List, Dict, Any, Optional
 
 
+# Characters allowed in a Slack user ID (ASCII letters, digits, underscores)
+_MENTION_ID_CHARS = string.ascii_letters + string.digits + "_"
+
+
+def strip_leading_mention(text: str) -> str:
+    """
+    Remove a leading <@USERID> mention and surrounding whitespace
+    
+    Only a well-formed mention at the very start of the text is removed; the
+    ID must be non-empty ASCII letters, digits or underscores. Mentions later
+    in the text are preserved.
+    """
+    if text.startswith("<@"):
+        end = text.find(">", 2)
+        # The ID must be non-empty and consist only of ASCII word characters
+        if end > 2 and not text[2:end].strip(_MENTION_ID_CHARS):
+            text = text[end + 1:]
+    return text.strip()
+
+
 class ContextFilter:
     """Filter message history for context isolation between AI models"""
     
-    # Compiled regex pattern for removing Slack mentions at the beginning of text
-    # Matches format: <@USERID> where USERID can contain word characters (letters, digits, underscores)
-    # The ^ anchor ensures we only match mentions at the start of the text
-    # Note: Slack user IDs are typically uppercase alphanumeric (e.g., U12345, USLACKBOT)
-    # but we use \w+ to be slightly more permissive for edge cases
-    MENTION_PATTERN = re.compile(r'^<@\w+>\s*')
+    # Inline command patterns stripped from user messages
+    MODEL_PATTERN = re.compile(r'model=[^\s]+')
+    MODE_PATTERN = re.compile(r'mode=(compare|debate)', re.IGNORECASE)
+    WHITESPACE_PATTERN = re.compile(r'\s+')
     
     def __init__(self, bot_user_id: str, llm_manager=None):
         """
@@ -43,17 +63,29 @@ class ContextFilter:
         """
         Clean user message by removing bot mentions and command patterns
         """
+        return self._clean_text(text)
+
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _clean_text(text: str) -> str:
+        """
+        Memoized body of clean_user_message
+        
+        Thread history is refetched on every mention, so the same user texts
+        are cleaned again and again; the transformation is pure, so repeats
+        are served from a bounded cache.
+        """
         # Remove bot mention
-        text = self.MENTION_PATTERN.sub('', text).strip()
+        text = strip_leading_mention(text)
         
         # Remove model=... patterns
-        text = re.sub(r'model=[^\s]+', '', text).strip()
+        text = ContextFilter.MODEL_PATTERN.sub('', text).strip()
         
         # Remove mode=... patterns
-        text = re.sub(r'mode=(compare|debate)', '', text, flags=re.IGNORECASE).strip()
+        text = ContextFilter.MODE_PATTERN.sub('', text).strip()
         
         # Clean up extra spaces
-        text = re.sub(r'\s+', ' ', text).strip()
+        text = ContextFilter.WHITESPACE_PATTERN.sub(' ', text).strip()
         
         return text
 
@@ -74,108 +106,154 @@ class ContextFilter:
             Text with leading mention removed
         """
         # Remove mentions (format: <@USERID>) from the beginning of text only
-        # The ^ anchor ensures we only match at the start
-        cleaned_text = self.MENTION_PATTERN.sub('', text).strip()
-        return cleaned_text
+        return strip_leading_mention(text)
     
-    def filter_messages_for_model(
+    def prepare_context(self, messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Classify and clean thread messages once, independent of the target model
+        
+        The result can be shared across every model answering the same thread
+        and passed to specialize_context, which only has to apply the cheap
+        per-model visibility rules.
+        
+        Args:
+            messages: List of Slack message objects from thread history
+        
+        Returns:
+            List of prepared entries with 'kind' ("user", "echo" or "bot"),
+            'content', 'username' and 'target_model_key'
+        """
+        prepared = []
+        
+        for msg in messages:
+            msg_get = msg.get
+            # Skip messages without text
+            text = msg_get("text")
+            if text is None:
+                continue
+            
+            username = msg_get("username", "")
+            
+            # Check for metadata indicating this is a user question echo; plain
+            # user messages carry no metadata and stop at the first probe
+            payload = None
+            metadata = msg_get("metadata")
+            if metadata is not None and metadata.get("event_type") == "slack_ai_council_echo":
+                event_payload = metadata.get("event_payload", {})
+                if event_payload.get("is_user_question"):
+                    payload = event_payload
+            
+            if payload is not None:
+                # Use the original question from metadata if available, otherwise use text
+                prepared.append({
+                    "kind": "echo",
+                    "content": payload.get("question", text),
+                    "username": username,
+                    "target_model_key": payload.get("target_model_key")
+                })
+            elif msg_get("bot_id") or msg_get("subtype") == "bot_message":
+                prepared.append({
+                    "kind": "bot",
+                    "content": text,
+                    "username": username,
+                    "target_model_key": None
+                })
+            else:
+                # Remove bot mentions and commands from user messages
+                prepared.append({
+                    "kind": "user",
+                    "content": self.clean_user_message(text),
+                    "username": username,
+                    "target_model_key": None
+                })
+        
+        return prepared
+    
+    def specialize_context(
         self,
-        messages: List[Dict[str, Any]],
+        prepared: List[Dict[str, Any]],
         target_model_username: str,
-        mode: str = "compare"
+        mode: str = "compare",
+        out: Optional[List[Dict[str, str]]] = None
     ) -> List[Dict[str, str]]:
         """
-        Filter thread messages for a specific model.
-        
-        Rules:
-        - Include all user messages (non-bot messages)
-        - Include only the target model's own previous responses
-        - Exclude other AI models' responses (unless in debate mode)
-        - Remove bot mentions from user messages
+        Apply per-model visibility rules to a prepared context
         
         Args:
-            messages: List of Slack message objects from thread history
+            prepared: Entries returned by prepare_context
             target_model_username: Username of the target model (e.g., "GPT-4o")
             mode: Operation mode ("compare" or "debate")
+            out: Optional list to append the filtered messages to
         
         Returns:
-            List of filtered messages in OpenAI chat format
+            List of filtered messages in OpenAI chat format (out, if given)
         """
-        filtered_messages = []
+        filtered_messages = [] if out is None else out
+        # Bind per-call invariants once instead of re-reading them per message
+        append = filtered_messages.append
+        is_debate = mode == "debate"
         
         # Get target model key from username
         target_model_key = self.model_usernames.get(target_model_username)
         
-        for msg in messages:
-            # Skip messages without text
-            if "text" not in msg:
-                continue
+        for entry in prepared:
+            kind = entry["kind"]
+            content = entry["content"]
             
-            text = msg["text"]
-            user_id = msg.get("user", "")
-            username = msg.get("username", "")
-            
-            # Check if this is a bot message
-            is_bot = msg.get("bot_id") or msg.get("subtype") == "bot_message"
-            
-            # Check for metadata indicating this is a user question echo
-            is_echo_user_question = False
-            if "metadata" in msg:
-                metadata = msg["metadata"]
-                if metadata.get("event_type") == "slack_ai_council_echo":
-                    payload = metadata.get("event_payload", {})
-                    if payload.get("is_user_question"):
-                        is_echo_user_question = True
-
-            if is_echo_user_question:
-                # Check if this question is intended for the target model
-                payload = msg["metadata"].get("event_payload", {})
-                msg_target_model_key = payload.get("target_model_key")
-                
+            if kind == "echo":
                 # If target_model_key is present in metadata, it must match the current target model
-                # If not present (legacy messages), we might include it or exclude it. 
-                # Assuming we want to be strict if the key is present.
+                msg_target_model_key = entry["target_model_key"]
                 if msg_target_model_key and target_model_key and msg_target_model_key != target_model_key:
                     continue
-
-                # Treat as user message
-                # Use the original question from metadata if available, otherwise use text
-                content = text
-                if "question" in payload:
-                    content = payload["question"]
                 
-                filtered_messages.append({
-                    "role": "user",
-                    "content": content
-                })
-            elif is_bot:
+                # Treat as user message
+                append({"role": "user", "content": content})
+            elif kind == "bot":
+                username = entry["username"]
                 # If it's the target model, include as assistant
                 if username == target_model_username:
-                    content = text
                     # In debate mode, prefix own messages too as requested
-                    if mode == "debate":
-                        content = f"[{username}]: {text}"
-                        
-                    filtered_messages.append({
-                        "role": "assistant",
-                        "content": content
-                    })
+                    if is_debate:
+                        content = f"[{username}]: {content}"
+                    
+                    append({"role": "assistant", "content": content})
                 # If debate mode, include other bots as user (with prefix)
-                elif mode == "debate":
-                    filtered_messages.append({
-                        "role": "user",
-                        "content": f"[{username}]: {text}"
-                    })
+                elif is_debate:
+                    append({"role": "user", "content": f"[{username}]: {content}"})
             else:
-                # Include all user messages, but remove bot mentions and commands
-                cleaned_text = self.clean_user_message(text)
-                filtered_messages.append({
-                    "role": "user",
-                    "content": cleaned_text
-                })
+                append({"role": "user", "content": content})
         
         return filtered_messages
     
+    def filter_messages_for_model(
+        self,
+        messages: List[Dict[str, Any]],
+        target_model_username: str,
+        mode: str = "compare"
+    ) -> List[Dict[str, str]]:
+        """
+        Filter thread messages for a specific model.
+        
+        Rules:
+        - Include all user messages (non-bot messages)
+        - Include only the target model's own previous responses
+        - Exclude other AI models' responses (unless in debate mode)
+        - Remove bot mentions from user messages
+        
+        Args:
+            messages: List of Slack message objects from thread history
+            target_model_username: Username of the target model (e.g., "GPT-4o")
+            mode: Operation mode ("compare" or "debate")
+        
+        Returns:
+            List of filtered messages in OpenAI chat format
+        """
+        return self.specialize_context(
+            self.prepare_context(messages),
+            target_model_username,
+            mode
+        )
+    
     def extract_user_question(self, messages: List[Dict[str, Any]]) -> str:
         """
         Extract the original user question from the thread
@@ -186,10 +264,11 @@ class ContextFilter:
         Returns:
             The first user message text (the original question) with mentions removed
         """
-        for msg in messages:
-            if "text" in msg and not msg.get("bot_id"):
-                return self.remove_bot_mention(msg["text"])
-        return ""
+        text = next(
+            (msg["text"] for msg in messages if "text" in msg and not msg.get("bot_id")),
+            None
+        )
+        return "" if text is None else strip_leading_mention(text)
     
     def is_bot_message(self, message: Dict[str, Any]) -> bool:
         """
@@ -241,20 +320,18 @@ class ContextFilter:
         Returns:
             Set of model identifiers that have responded
         """
-        models = set()
-        for msg in messages:
-            # Try to get model from metadata first (preferred)
-            model_key = self.get_model_from_metadata(msg)
-            if model_key:
-                models.add(model_key)
-            # Fallback to username-based detection for backwards compatibility
-            elif self.is_bot_message(msg):
-                username = msg.get("username", "")
-                if username:
-                    model_key = self.get_model_from_username(username)
-                    if model_key != "unknown":
-                        models.add(model_key)
-        return models
+        get_from_metadata = self.get_model_from_metadata
+        is_bot_message = self.is_bot_message
+        model_usernames = self.model_usernames
+        # Metadata is preferred; bot usernames are the fallback for backwards
+        # compatibility. Unmapped or empty usernames yield None and are dropped.
+        return {
+            model_key
+            for msg in messages
+            if (model_key := get_from_metadata(msg) or (
+                is_bot_message(msg) and model_usernames.get(msg.get("username", ""))
+            ))
+        }
     
     def build_prompt_with_context(
         self,
@@ -272,6 +349,32 @@ class ContextFilter:
             system_prompt: Optional system prompt to prepend
             mode: Operation mode ("compare" or "debate")
         
+        Returns:
+            Complete list of messages ready for AI API
+        """
+        return self.build_prompt_from_prepared(
+            self.prepare_context(thread_messages),
+            target_model_username,
+            system_prompt,
+            mode
+        )
+    
+    def build_prompt_from_prepared(
+        self,
+        prepared: List[Dict[str, Any]],
+        target_model_username: str,
+        system_prompt: str = None,
+        mode: str = "compare"
+    ) -> List[Dict[str, str]]:
+        """
+        Build a complete prompt from a context shared across models
+        
+        Args:
+            prepared: Entries returned by prepare_context
+            target_model_username: Username of the target model
+            system_prompt: Optional system prompt to prepend
+            mode: Operation mode ("compare" or "debate")
+        
         Returns:
             Complete list of messages ready for AI API
         """
@@ -284,17 +387,27 @@ class ContextFilter:
                 "content": system_prompt
             })
         
-        # Add filtered messages
-        filtered = self.filter_messages_for_model(thread_messages, target_model_username, mode)
-        messages.extend(filtered)
-        
-        return messages
+        # Add filtered messages directly, without an intermediate list
+        return self.specialize_context(prepared, target_model_username, mode, out=messages)
 
 
+# Formatting instructions appended to every system prompt
+_SLACK_FORMATTING_SUFFIX = (
+    "IMPORTANT: You are chatting in Slack. Please use Slack-compatible formatting:\n"
+    "- Use *bold* for bold (not **bold**)\n"
+    "- Use _italics_ for italics (not *italics*)\n"
+    "- Use <url|text> for links (not [text](url))\n"
+    "- Do not use # for headers, use *bold* instead"
+)
+
+
+@lru_cache(maxsize=64)
 def create_default_system_prompt(model_name: str, mode: str = "compare", role: str = None) -> str:
     """
     Create a default system prompt based on mode
     
+    The result depends only on the arguments, so it is memoized.
+    
     Args:
         model_name: Name of the model
         mode: Operation mode ("compare" or "debate")
@@ -308,11 +421,7 @@ def create_default_system_prompt(model_name: str, mode: str = "compare", role: s
             f"You are {model_name}, participating in a multi-AI comparison. "
             "Provide your perspective on the user's question. "
             "Be concise, helpful, and show your unique approach to problem-solving.\n\n"
-            "IMPORTANT: You are chatting in Slack. Please use Slack-compatible formatting:\n"
-            "- Use *bold* for bold (not **bold**)\n"
-            "- Use _italics_ for italics (not *italics*)\n"
-            "- Use <url|text> for links (not [text](url))\n"
-            "- Do not use # for headers, use *bold* instead"
+            + _SLACK_FORMATTING_SUFFIX
         )
     elif mode == "debate":
         role_instruction = ""
@@ -328,18 +437,10 @@ def create_default_system_prompt(model_name: str, mode: str = "compare", role: s
             "and build upon or challenge previous points constructively. "
             "Keep your response concise and focused on key points, strictly under 100 words. "
             "Respond in the same language as the original user question.\n\n"
-            "IMPORTANT: You are chatting in Slack. Please use Slack-compatible formatting:\n"
-            "- Use *bold* for bold (not **bold**)\n"
-            "- Use _italics_ for italics (not *italics*)\n"
-            "- Use <url|text> for links (not [text](url))\n"
-            "- Do not use # for headers, use *bold* instead"
+            + _SLACK_FORMATTING_SUFFIX
         )
     else:
         return (
             f"You are {model_name}, a helpful AI assistant.\n\n"
-            "IMPORTANT: You are chatting in Slack. Please use Slack-compatible formatting:\n"
-            "- Use *bold* for bold (not **bold**)\n"
-            "- Use _italics_ for italics (not *italics*)\n"
-            "- Use <url|text> for links (not [text](url))\n"
-            "- Do not use # for headers, use *bold* instead"
+            + _SLACK_FORMATTING_SUFFIX
         )
@@ -9,15 +9,62 @@ This module provides a unified interface for interacting with different AI model
 """
 
 import os
+import asyncio
+import contextlib
+import hashlib
 import inspect
-import sys
+import logging
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
+from functools import lru_cache
+from types import MappingProxyType
+from typing import List, Dict, Any, AsyncIterator, Iterable, Mapping, Optional, Tuple, Union
 from dotenv import load_dotenv
 
+# Provider SDKs are optional; an adapter whose SDK is missing is skipped
+try:
+    from openai import AsyncOpenAI
+except ImportError:
+    AsyncOpenAI = None
+
+try:
+    from google import genai
+    from google.genai import types as genai_types
+except ImportError:
+    genai = genai_types = None
+
+try:
+    from xai_sdk import AsyncClient as XAIAsyncClient
+    from xai_sdk.chat import user as xai_user, system as xai_system, assistant as xai_assistant
+    from xai_sdk.tools import web_search
+except ImportError:
+    XAIAsyncClient = None
+
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# Concurrent requests allowed per provider, so several adapters backed by one
+# provider share its rate limit instead of racing into 429s
+PROVIDER_CONCURRENCY = {"openai": 20, "google": 20, "xai": 10, "bytedance": 10}
+DEFAULT_PROVIDER_CONCURRENCY = 10
+
+# Timeout (seconds) for the warmup request to an adapter's base_url; warmup is
+# best effort, so an unreachable endpoint is given up on quickly
+WARMUP_TIMEOUT = 3.0
+
+# Adapter classes by adapter_key, filled in as LLMAdapter subclasses are defined
+ADAPTER_CLASSES: Dict[str, type] = {}
+
+
+class ErrorResponse(str):
+    """
+    Error text returned or yielded by an adapter in place of model output
+    
+    It is shown to the user like any other response, but callers can tell a
+    failed generation apart with isinstance instead of matching its wording.
+    """
+
 
 class LLMAdapter(ABC):
     """Abstract base class for LLM adapters"""
@@ -25,6 +72,30 @@ class LLMAdapter(ABC):
     # Class variable to store the adapter key for auto-registration
     adapter_key: str = None
     
+    # API provider, used to share rate limits between adapters of one provider
+    provider: str = None
+    
+    # Whether stream_response yields incremental deltas rather than the
+    # finished response in one piece
+    supports_streaming: bool = False
+    
+    # Endpoint of HTTP-based SDKs that talk through the shared http_client
+    base_url: str = None
+    
+    def __init_subclass__(cls, **kwargs):
+        """Register subclasses that define an adapter_key in ADAPTER_CLASSES"""
+        super().__init_subclass__(**kwargs)
+        if cls.adapter_key is None:
+            return
+        existing = ADAPTER_CLASSES.get(cls.adapter_key)
+        if existing is not None:
+            logger.warning(
+                "⚠ Duplicate adapter_key '%s' found in %s and %s. Skipping %s.",
+                cls.adapter_key, cls.__name__, existing.__name__, cls.__name__
+            )
+            return
+        ADAPTER_CLASSES[cls.adapter_key] = cls
+    
     def __init__(self, model_name: str, username: str, icon_emoji: str):
         """
         Initialize LLM adapter
@@ -37,6 +108,12 @@ class LLMAdapter(ABC):
         self.model_name = model_name
         self.username = username
         self.icon_emoji = icon_emoji
+        # Shared httpx.AsyncClient assigned by LLMManager, reused by HTTP-based SDKs
+        self.http_client = None
+        # SDK client, created on first use and reused so connections stay warm
+        self._client = None
+        # Read-only display config, built once and handed out for every Slack post
+        self._display_config: Optional[Mapping[str, str]] = None
     
     @abstractmethod
     async def generate_response(self, messages: List[Dict[str, str]]) -> str:
@@ -51,23 +128,84 @@ class LLMAdapter(ABC):
         """
         pass
     
-    def get_display_config(self) -> Dict[str, str]:
-        """Get Slack display configuration for this model"""
-        return {
-            "username": self.username,
-            "icon_emoji": self.icon_emoji
-        }
+    async def stream_response(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """
+        Stream a response from the AI model as incremental text deltas
+        
+        Adapters without native streaming support yield the complete
+        response from generate_response as a single delta. Streaming
+        adapters yield an empty delta for events without text (reasoning,
+        search progress) so callers can tell a thinking model from a
+        stalled one.
+        
+        Args:
+            messages: List of message dictionaries with 'role' and 'content'
+        
+        Yields:
+            Text deltas in generation order
+        """
+        yield await self.generate_response(messages)
+    
+    def error_response(self, error: Union[Exception, str]) -> ErrorResponse:
+        """Build the error text reported when generation fails"""
+        return ErrorResponse(f"Error generating response from {self.username}: {str(error)}")
+    
+    async def warmup(self):
+        """
+        Prepare the adapter before its first request
+        
+        Creates the SDK client and, for HTTP-based adapters, opens a pooled
+        connection to base_url so the first real request skips the TCP/TLS
+        handshake.
+        """
+        get_client = getattr(self, "_get_client", None)
+        if get_client is not None:
+            get_client()
+        if self.http_client is not None and self.base_url:
+            await self.http_client.head(self.base_url, timeout=WARMUP_TIMEOUT)
+    
+    async def aclose(self):
+        """
+        Close the cached SDK client and its connections
+        
+        SDK clients built on the shared http_client are only dropped; the
+        shared client is closed by its owner.
+        """
+        client, self._client = self._client, None
+        if client is None or (self.base_url and self.http_client is not None):
+            return
+        close = getattr(client, "aclose", None) or getattr(client, "close", None)
+        if close is not None:
+            result = close()
+            if inspect.isawaitable(result):
+                await result
+    
+    def get_display_config(self) -> Mapping[str, str]:
+        """Get Slack display configuration for this model (shared and read-only)"""
+        config = self._display_config
+        if (config is None or config["username"] != self.username
+                or config["icon_emoji"] != self.icon_emoji):
+            config = self._display_config = MappingProxyType({
+                "username": self.username,
+                "icon_emoji": self.icon_emoji
+            })
+        return config
 
 
 class OpenAIAdapter(LLMAdapter):
     """Adapter for OpenAI API"""
     
     adapter_key = "openai"
+    supports_streaming = True
+    provider = "openai"
+    base_url = "https://api.openai.com/v1"
     
     def __init__(self, model_name: str = None, username: str = None):
         self.api_key = os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("OPENAI_API_KEY not found in environment variables")
+        if AsyncOpenAI is None:
+            raise ValueError("openai package is not installed")
             
         if model_name is None:
             model_name = os.getenv("OPENAI_MODEL", "gpt-5.2")
@@ -83,44 +221,101 @@ class OpenAIAdapter(LLMAdapter):
             icon_emoji=":ai-chatgpt:"
         )
     
+    @staticmethod
+    @lru_cache(maxsize=64)
+    def _prompt_cache_key(system_prompt: str) -> str:
+        """Hash a system prompt into a short, stable prompt cache routing key"""
+        return hashlib.blake2b(system_prompt.encode(), digest_size=16).hexdigest()
+    
+    def _build_request(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        """Build keyword arguments for the Responses API"""
+        kwargs = {
+            "model": self.model_name,
+            "input": messages,
+            "text": {
+                "format": {
+                    "type": "text"
+                }
+            },
+            "reasoning": {},
+            "max_output_tokens": 2048,
+            "store": False,
+            "include": [
+                "reasoning.encrypted_content",
+                "web_search_call.action.sources"
+            ]
+        }
+        
+        if self.prompt_id:
+            kwargs["prompt"] = {"id": self.prompt_id, "version": "1"}
+        
+        # Requests sharing a system prompt share their prompt prefix; routing
+        # them together lets OpenAI reuse the cached prefill
+        if messages and messages[0].get("role") == "system":
+            kwargs["prompt_cache_key"] = self._prompt_cache_key(messages[0].get("content", ""))
+        
+        return kwargs
+    
+    def _get_client(self):
+        """Return the cached AsyncOpenAI client, creating it on first use"""
+        if self._client is None:
+            self._client = AsyncOpenAI(api_key=self.api_key, http_client=self.http_client)
+        return self._client
+    
     async def generate_response(self, messages: List[Dict[str, str]]) -> str:
         """Generate response using OpenAI API"""
         try:
-            from openai import AsyncOpenAI
-            client = AsyncOpenAI(api_key=self.api_key)
-            
-            kwargs = {
-                "model": self.model_name,
-                "input": messages,
-                "text": {
-                    "format": {
-                        "type": "text"
-                    }
-                },
-                "reasoning": {},
-                "max_output_tokens": 2048,
-                "store": False,
-                "include": [
-                    "reasoning.encrypted_content",
-                    "web_search_call.action.sources"
-                ]
-            }
-            
-            if self.prompt_id:
-                kwargs["prompt"] = {"id": self.prompt_id, "version": "1"}
-            
-            response = await client.responses.create(**kwargs)
-            
-            target_obj = next(filter(lambda x: x.type == 'message', response.output), None)
+            response = await self._get_client().responses.create(**self._build_request(messages))
+            
+            # The message item follows any reasoning and tool-call items, so
+            # scan from the end
+            target_obj = None
+            for item in reversed(response.output):
+                if item.type == "message":
+                    target_obj = item
+                    break
             return target_obj.content[0].text
         except Exception as e:
-            return f"Error generating response from {self.username}: {str(e)}"
+            return self.error_response(e)
+    
+    async def stream_response(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Stream response text deltas using OpenAI API"""
+        try:
+            stream = await self._get_client().responses.create(
+                **self._build_request(messages), stream=True
+            )
+            async for event in stream:
+                if event.type == "response.output_text.delta":
+                    yield event.delta
+                elif event.type == "response.failed":
+                    error = event.response.error
+                    yield self.error_response(error.message if error else "response failed")
+                    return
+                elif event.type == "response.incomplete":
+                    details = event.response.incomplete_details
+                    reason = details.reason if details else None
+                    yield self.error_response(f"response incomplete ({reason or 'unknown reason'})")
+                    return
+                elif event.type == "error":
+                    yield self.error_response(event.message)
+                    return
+                else:
+                    yield ""
+        except Exception as e:
+            yield self.error_response(e)
+
+
+# Chat roles as named by the Gemini API; other roles are dropped
+GEMINI_ROLES = {"user": "user", "assistant": "model"}
 
 
 class GeminiAdapter(LLMAdapter):
     """Adapter for Google Gemini API (3 Flash Preview)"""
     
     adapter_key = "gemini"
+    supports_streaming = True
+    provider = "google"
+    base_url = "https://generativelanguage.googleapis.com"
     
     def __init__(self, model_name: str = None, username: str = None):
         if model_name is None:
@@ -137,70 +332,99 @@ class GeminiAdapter(LLMAdapter):
         self.api_key = os.getenv("GOOGLE_API_KEY")
         if not self.api_key:
             raise ValueError("GOOGLE_API_KEY not found in environment variables")
+        if genai is None:
+            raise ValueError("google-genai package is not installed")
+    
+    def _get_client(self):
+        """Return the cached Gemini client, creating it on first use"""
+        if self._client is None:
+            # client.aio goes through the shared http_client when there is one
+            self._client = genai.Client(
+                api_key=self.api_key,
+                http_options=genai_types.HttpOptions(httpx_async_client=self.http_client)
+            )
+        return self._client
+    
+    async def aclose(self):
+        """Close the async transport used by client.aio, unless it is the shared one"""
+        client, self._client = self._client, None
+        if client is not None and self.http_client is None:
+            await client.aio.aclose()
+    
+    def _build_request(
+        self, messages: List[Dict[str, str]], include_thoughts: bool = False
+    ) -> Dict[str, Any]:
+        """Build keyword arguments for generate_content"""
+        # Convert messages to Gemini format
+        contents = []
+        system_instruction = None
+        
+        for msg in messages:
+            role = msg.get("role", "user")
+            content = msg.get("content", "")
+            
+            if role == "system":
+                system_instruction = content
+                continue
+            gemini_role = GEMINI_ROLES.get(role)
+            if gemini_role is not None:
+                contents.append(genai_types.Content(
+                    role=gemini_role,
+                    parts=[genai_types.Part.from_text(text=content)]
+                ))
+        
+        # Configure generation with thinking and tools
+        tools = [
+            genai_types.Tool(google_search=genai_types.GoogleSearch())
+        ]
+        
+        config = genai_types.GenerateContentConfig(
+            thinking_config=genai_types.ThinkingConfig(
+                thinking_level="HIGH",
+                include_thoughts=include_thoughts,
+            ),
+            tools=tools,
+        )
+        
+        if system_instruction:
+            config.system_instruction = genai_types.Content(
+                parts=[genai_types.Part.from_text(text=system_instruction)]
+            )
+        
+        return {"model": self.model_name, "contents": contents, "config": config}
     
     async def generate_response(self, messages: List[Dict[str, str]]) -> str:
         """Generate response using Google Gemini API"""
         try:
-            from google import genai
-            from google.genai import types
-            
-            # Create async client
-            client = genai.Client(api_key=self.api_key)
-            
-            # Convert messages to Gemini format
-            contents = []
-            system_instruction = None
-            
-            for msg in messages:
-                role = msg.get("role", "user")
-                content = msg.get("content", "")
-                
-                if role == "system":
-                    system_instruction = content
-                elif role == "user":
-                    contents.append(types.Content(
-                        role="user",
-                        parts=[types.Part.from_text(text=content)]
-                    ))
-                elif role == "assistant":
-                    contents.append(types.Content(
-                        role="model",
-                        parts=[types.Part.from_text(text=content)]
-                    ))
-            
-            # Configure generation with thinking and tools
-            tools = [
-                types.Tool(google_search=types.GoogleSearch())
-            ]
-            
-            config = types.GenerateContentConfig(
-                thinking_config=types.ThinkingConfig(
-                    thinking_level="HIGH",
-                ),
-                tools=tools,
-            )
-            
-            if system_instruction:
-                config.system_instruction = types.Content(
-                    parts=[types.Part.from_text(text=system_instruction)]
-                )
-
             # Generate response using async API
-            response = await client.aio.models.generate_content(
-                model=self.model_name,
-                contents=contents,
-                config=config
+            response = await self._get_client().aio.models.generate_content(
+                **self._build_request(messages)
             )
             
             return response.text
         except Exception as e:
-            return f"Error generating response from {self.username}: {str(e)}"
+            return self.error_response(e)
+    
+    async def stream_response(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Stream response text chunks using Google Gemini API"""
+        try:
+            # Thought summaries arrive while the model thinks; chunk.text
+            # skips them, so they only mark progress
+            stream = await self._get_client().aio.models.generate_content_stream(
+                **self._build_request(messages, include_thoughts=True)
+            )
+            async for chunk in stream:
+                yield chunk.text or ""
+        except Exception as e:
+            yield self.error_response(e)
 
 
 class GrokAdapter(LLMAdapter):
     """Adapter for X.AI Grok API (Grok 3)"""
     
     adapter_key = "grok"
+    supports_streaming = True
+    provider = "xai"
     
     def __init__(self, model_name: str = None, username: str = None):
         if model_name is None:
@@ -217,59 +441,78 @@ class GrokAdapter(LLMAdapter):
         self.api_key = os.getenv("XAI_API_KEY")
         if not self.api_key:
             raise ValueError("XAI_API_KEY not found in environment variables")
+        if XAIAsyncClient is None:
+            raise ValueError("xai-sdk package is not installed")
+    
+    def _get_client(self):
+        """Return the cached xAI client, reusing its gRPC channel across calls"""
+        if self._client is None:
+            self._client = XAIAsyncClient(api_key=self.api_key)
+        return self._client
+    
+    def _build_chat(self, messages: List[Dict[str, str]]):
+        """Create a chat with web search and inline citations holding the messages"""
+        # Create chat with web search tool and inline citations
+        chat = self._get_client().chat.create(
+            model=self.model_name,
+            tools=[web_search()],
+            include=["inline_citations"],
+        )
+        
+        # Add messages to chat
+        for msg in messages:
+            role = msg.get("role", "user")
+            content = msg.get("content", "")
+            
+            if role == "system":
+                chat.append(xai_system(content))
+            elif role == "user":
+                chat.append(xai_user(content))
+            elif role == "assistant":
+                chat.append(xai_assistant(content))
+        
+        return chat
+    
+    def _log_citations(self, response):
+        """Log inline citations if available"""
+        if logger.isEnabledFor(logging.DEBUG) and hasattr(response, "inline_citations"):
+            logger.debug("Inline citations from %s:", self.username)
+            for citation in response.inline_citations:
+                if hasattr(citation, "HasField") and citation.HasField("web_citation"):
+                    logger.debug("[%s] %s", citation.id, citation.web_citation.url)
+                elif hasattr(citation, "web_citation"):
+                    logger.debug("[%s] %s", citation.id, citation.web_citation.url)
     
     async def generate_response(self, messages: List[Dict[str, str]]) -> str:
         """Generate response using X.AI Grok API"""
         try:
-            from xai_sdk import AsyncClient
-            from xai_sdk.chat import user, system, assistant
-            from xai_sdk.tools import web_search
-            
-            client = AsyncClient(api_key=self.api_key)
-            
-            # Create chat with web search tool and inline citations
-            chat = client.chat.create(
-                model=self.model_name,
-                tools=[web_search()],
-                include=["inline_citations"],
-            )
-            
-            # Add messages to chat
-            for msg in messages:
-                role = msg.get("role", "user")
-                content = msg.get("content", "")
-                
-                if role == "system":
-                    chat.append(system(content))
-                elif role == "user":
-                    chat.append(user(content))
-                elif role == "assistant":
-                    chat.append(assistant(content))
-            
             # Generate response using sample (non-streaming)
-            response = await chat.sample()
-            
-            content = response.content
-            
-            # Log inline citations if available
-            if hasattr(response, "inline_citations"):
-                print(f"Inline citations from {self.username}:")
-                for citation in response.inline_citations:
-                    if hasattr(citation, "HasField") and citation.HasField("web_citation"):
-                        print(f"[{citation.id}] {citation.web_citation.url}")
-                    elif hasattr(citation, "web_citation"):
-                         print(f"[{citation.id}] {citation.web_citation.url}")
-            
-            return content
+            response = await self._build_chat(messages).sample()
+            self._log_citations(response)
+            return response.content
             
         except Exception as e:
-            return f"Error generating response from {self.username}: {str(e)}"
+            return self.error_response(e)
+    
+    async def stream_response(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Stream response text chunks using X.AI Grok API"""
+        try:
+            response = None
+            async for response, chunk in self._build_chat(messages).stream():
+                yield chunk.content or ""
+            if response is not None:
+                self._log_citations(response)
+        except Exception as e:
+            yield self.error_response(e)
 
 
 class DoubaoAdapter(LLMAdapter):
     """Adapter for ByteDance Doubao API (Seed 1.8)"""
     
     adapter_key = "doubao"
+    supports_streaming = True
+    provider = "bytedance"
+    base_url = "https://ark.cn-beijing.volces.com/api/v3/bots"
     
     def __init__(self, model_name: str = None, username: str = None):
         if model_name is None:
@@ -286,70 +529,137 @@ class DoubaoAdapter(LLMAdapter):
         self.api_key = os.getenv("DOUBAO_API_KEY")
         if not self.api_key:
             raise ValueError("DOUBAO_API_KEY not found in environment variables")
+        if AsyncOpenAI is None:
+            raise ValueError("openai package is not installed")
+    
+    def _get_client(self):
+        """Return the cached AsyncOpenAI client for Doubao, creating it on first use"""
+        if self._client is None:
+            self._client = AsyncOpenAI(
+                base_url=self.base_url,
+                api_key=self.api_key,
+                http_client=self.http_client
+            )
+        return self._client
     
     async def generate_response(self, messages: List[Dict[str, str]]) -> str:
         """Generate response using ByteDance Doubao API"""
         try:
-            from openai import AsyncOpenAI
-            
-            # Initialize AsyncOpenAI client for Doubao
-            client = AsyncOpenAI(
-                base_url="https://ark.cn-beijing.volces.com/api/v3/bots",
-                api_key=self.api_key
-            )
-            
-            response = await client.chat.completions.create(
+            response = await self._get_client().chat.completions.create(
                 model=self.model_name,
                 messages=messages
             )
             
             content = response.choices[0].message.content
             
-            # Check for references if available (optional logging or appending)
-            if hasattr(response, "references"):
-                print(f"References from {self.username}: {response.references}")
+            # Log references if available, without paying for the lookup unless debugging
+            if logger.isEnabledFor(logging.DEBUG):
+                references = getattr(response, "references", None)
+                if references:
+                    logger.debug("References from %s: %s", self.username, references)
                 
             return content
         except Exception as e:
-            return f"Error generating response from {self.username}: {str(e)}"
+            return self.error_response(e)
+    
+    async def stream_response(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Stream response text deltas using ByteDance Doubao API"""
+        try:
+            stream = await self._get_client().chat.completions.create(
+                model=self.model_name,
+                messages=messages,
+                stream=True
+            )
+            async for chunk in stream:
+                # Reasoning chunks carry no content but still mark progress
+                yield (chunk.choices and chunk.choices[0].delta.content) or ""
+        except Exception as e:
+            yield self.error_response(e)
 
 
 class LLMManager:
     """Manager class to handle multiple LLM adapters"""
     
-    def __init__(self):
-        """Initialize LLM manager with available adapters"""
+    def __init__(
+        self,
+        http_client=None,
+        provider_limits: Optional[Dict[str, int]] = None,
+        concurrency_limit: int = 0
+    ):
+        """
+        Initialize LLM manager with available adapters
+        
+        Args:
+            http_client: Optional shared httpx.AsyncClient whose connection
+                pool is reused by every HTTP-based adapter
+            provider_limits: Optional per-provider concurrency overrides on
+                top of PROVIDER_CONCURRENCY
+            concurrency_limit: Optional cap on in-flight requests across all
+                providers (0 means only the per-provider limits apply)
+        """
         self.adapters: Dict[str, LLMAdapter] = {}
+        self.http_client = http_client
+        self.provider_limits = {**PROVIDER_CONCURRENCY, **(provider_limits or {})}
+        self._provider_sems: Dict[str, asyncio.Semaphore] = {}
+        self._global_sem = asyncio.Semaphore(concurrency_limit) if concurrency_limit > 0 else None
+        self._adapter_tuple: Optional[Tuple[LLMAdapter, ...]] = None
+        self._username_mapping: Optional[Dict[str, str]] = None
+        self._username_keys: Optional[Dict[str, str]] = None
         self._initialize_adapters()
     
     def _initialize_adapters(self):
-        """Initialize all available LLM adapters by auto-discovering adapter classes"""
-        # Get all classes in the current module that are subclasses of LLMAdapter
-        current_module = sys.modules[__name__]
-        adapter_classes = []
-        seen_keys = {}
-        
-        for name, obj in inspect.getmembers(current_module, inspect.isclass):
-            # Check if it's a subclass of LLMAdapter but not LLMAdapter itself
-            if issubclass(obj, LLMAdapter) and obj is not LLMAdapter:
-                # Check if it has an adapter_key defined
-                if hasattr(obj, 'adapter_key') and obj.adapter_key is not None:
-                    # Check for duplicate keys
-                    if obj.adapter_key in seen_keys:
-                        print(f"⚠ Warning: Duplicate adapter_key '{obj.adapter_key}' found in {name} and {seen_keys[obj.adapter_key]}. Skipping {name}.")
-                        continue
-                    seen_keys[obj.adapter_key] = name
-                    adapter_classes.append((obj.adapter_key, obj))
+        """Initialize all available LLM adapters from the registered adapter classes"""
+        # Ordered by class name so adapter (and debate turn) order stays stable
+        adapter_classes = sorted(ADAPTER_CLASSES.items(), key=lambda item: item[1].__name__)
         
         # Initialize each adapter
         for adapter_key, adapter_class in adapter_classes:
             try:
-                self.adapters[adapter_key] = adapter_class()
-                print(f"✓ Initialized {adapter_key} adapter")
+                self.register_adapter(adapter_key, adapter_class())
+                logger.info("✓ Initialized %s adapter", adapter_key)
             except ValueError as e:
-                print(f"✗ Skipping {adapter_key} adapter: {e}")
+                logger.warning("✗ Skipping %s adapter: %s", adapter_key, e)
             except Exception as e:
-                print(f"✗ Error initializing {adapter_key} adapter: {e}")
+                logger.error("✗ Error initializing %s adapter: %s", adapter_key, e)
+    
+    def register_adapter(self, adapter_key: str, adapter: LLMAdapter):
+        """
+        Register an adapter under the given key
+        
+        Args:
+            adapter_key: Key the adapter is looked up by
+            adapter: Adapter instance
+        """
+        adapter.http_client = self.http_client
+        self.adapters[adapter_key] = adapter
+        self._adapter_tuple = None
+        self._username_mapping = None
+        self._username_keys = None
+    
+    def provider_semaphore(self, adapter: LLMAdapter) -> asyncio.Semaphore:
+        """Return the semaphore bounding concurrent calls to the adapter's provider"""
+        provider = adapter.provider or adapter.adapter_key
+        sem = self._provider_sems.get(provider)
+        if sem is None:
+            sem = self._provider_sems[provider] = asyncio.Semaphore(
+                self.provider_limits.get(provider, DEFAULT_PROVIDER_CONCURRENCY)
+            )
+        return sem
+    
+    @contextlib.asynccontextmanager
+    async def request_slot(self, adapter: LLMAdapter):
+        """
+        Hold a slot for one model request under the provider and global limits
+        
+        The provider slot is taken first, so a request waiting on its own
+        provider never holds a global slot another provider could use.
+        """
+        async with self.provider_semaphore(adapter):
+            if self._global_sem is None:
+                yield
+            else:
+                async with self._global_sem:
+                    yield
     
     def get_adapter(self, model_name: str) -> LLMAdapter:
         """
@@ -364,13 +674,35 @@ class LLMManager:
         Raises:
             KeyError: If adapter not found
         """
-        if model_name not in self.adapters:
+        adapter = self.adapters.get(model_name)
+        if adapter is None:
             raise KeyError(f"LLM adapter '{model_name}' not found")
-        return self.adapters[model_name]
+        return adapter
     
-    def get_all_adapters(self) -> List[LLMAdapter]:
-        """Get all initialized adapters"""
-        return list(self.adapters.values())
+    def get_adapters(self, model_names: Iterable[str]) -> List[LLMAdapter]:
+        """
+        Get the adapters for several model names, skipping unknown ones
+        
+        Args:
+            model_names: Adapter keys to look up
+        
+        Returns:
+            Adapters found, in the order of model_names
+        """
+        adapters = []
+        for model_name in model_names:
+            adapter = self.adapters.get(model_name)
+            if adapter is None:
+                logger.warning("Model %s not found in available adapters", model_name)
+            else:
+                adapters.append(adapter)
+        return adapters
+    
+    def get_all_adapters(self) -> Tuple[LLMAdapter, ...]:
+        """Get all initialized adapters as a shared, immutable tuple"""
+        if self._adapter_tuple is None:
+            self._adapter_tuple = tuple(self.adapters.values())
+        return self._adapter_tuple
     
     def get_adapter_names(self) -> List[str]:
         """Get names of all initialized adapters"""
@@ -380,18 +712,65 @@ class LLMManager:
         """
         Get mapping of model usernames to adapter keys
         
+        The mapping is built once and shared until an adapter is registered;
+        callers must not mutate it.
+        
         Returns:
             Dictionary mapping username (e.g., "GPT-4o") to adapter key (e.g., "openai")
         """
-        mapping = {}
-        for adapter_key, adapter in self.adapters.items():
-            mapping[adapter.username] = adapter_key
-        return mapping
+        if self._username_mapping is None:
+            self._username_mapping = {
+                adapter.username: adapter_key for adapter_key, adapter in self.adapters.items()
+            }
+        return self._username_mapping
+    
+    def find_adapter_key(self, username: str) -> Optional[str]:
+        """
+        Resolve a model username to its adapter key, ignoring case
+        
+        Args:
+            username: Model username as typed by the user (e.g., "gpt-4o")
+        
+        Returns:
+            Adapter key, or None if no adapter has that username
+        """
+        if self._username_keys is None:
+            # Lowercased usernames first, so exact spellings win on collisions
+            self._username_keys = {
+                adapter.username.lower(): key for key, adapter in self.adapters.items()
+            }
+            self._username_keys.update(self.get_username_mapping())
+        return self._username_keys.get(username) or self._username_keys.get(username.lower())
+    
+    async def warmup_all(self):
+        """Warm up every adapter concurrently; failures are logged, never raised"""
+        adapters = self.get_all_adapters()
+        results = await asyncio.gather(
+            *(adapter.warmup() for adapter in adapters),
+            return_exceptions=True
+        )
+        for adapter, result in zip(adapters, results):
+            if isinstance(result, Exception):
+                logger.warning("✗ Warmup failed for %s: %s", adapter.adapter_key, result)
+    
+    async def aclose(self):
+        """Close every adapter's SDK client; failures are logged, never raised"""
+        adapters = self.get_all_adapters()
+        results = await asyncio.gather(
+            *(adapter.aclose() for adapter in adapters),
+            return_exceptions=True
+        )
+        for adapter, result in zip(adapters, results):
+            if isinstance(result, Exception):
+                logger.warning("✗ Closing %s failed: %s", adapter.adapter_key, result)
     
     async def generate_response(self, model_name: str, messages: List[Dict[str, str]]) -> str:
         """
         Generate response from a specific model
         
+        The call holds a request slot, so direct callers fanning out across
+        models get the same provider and global limits as the Slack handlers.
+        
         Args:
             model_name: Name of the model to use
             messages: List of message dictionaries
@@ -401,11 +780,11 @@ class LLMManager:
         """
         adapter = self.get_adapter(model_name)
         
-        print(f"\n=== Sending messages to {model_name} ===")
-        for msg in messages:
-            role = msg.get('role', 'unknown')
-            content = msg.get('content', '(no content)')
-            print(f"[{role}]: {content}")
-        print("========================================\n")
+        # Skip the per-message loop entirely unless debug logging is on
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("=== Sending messages to %s ===", model_name)
+            for msg in messages:
+                logger.debug("[%s]: %s", msg.get('role', 'unknown'), msg.get('content', '(no content)'))
 
-        return await adapter.generate_response(messages)
+        async with self.request_slot(adapter):
+            return await adapter.generate_response(messages)
@@ -13,6 +13,34 @@ from typing import Dict, Any
 class ModeCommand:
     """Helper class for parsing inline mode specification"""
     
+    # Matches mode=compare or mode=debate anywhere in the text
+    MODE_PATTERN = re.compile(r'mode=(compare|debate)', re.IGNORECASE)
+    
+    @staticmethod
+    def extract_inline_mode(text: str) -> Dict[str, Any]:
+        """
+        Extract an inline mode specification from text.
+        
+        Args:
+            text: Message text
+            
+        Returns:
+            Dict with 'mode' and the remaining 'question', or an empty
+            dict if no valid mode is specified
+        """
+        # Most messages carry no mode at all; skip the regex for them
+        if not text or "=" not in text:
+            return {}
+        
+        match = ModeCommand.MODE_PATTERN.search(text)
+        if not match:
+            return {}
+        
+        return {
+            "mode": match.group(1).lower(),
+            "question": text.replace(match.group(0), "", 1).strip()
+        }
+    
     @staticmethod
     def extract_mode(text: str) -> tuple[str, str]:
         """
@@ -25,15 +53,7 @@ class ModeCommand:
             Tuple of (cleaned_text, mode)
             mode is "compare" (default) if not specified
         """
-        mode = "compare"
-        cleaned_text = text
-        
-        # Match mode=compare or mode=debate anywhere in the text
-        match = re.search(r'mode=(compare|debate)', cleaned_text, re.IGNORECASE)
-        
-        if match:
-            mode = match.group(1).lower()
-            # Remove the mode specification
-            cleaned_text = cleaned_text.replace(match.group(0), "", 1).strip()
-            
-        return cleaned_text, mode
+        result = ModeCommand.extract_inline_mode(text)
+        if not result:
+            return text, "compare"
+        return result["question"], result["mode"]
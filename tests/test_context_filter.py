@@ -93,6 +93,21 @@ class TestContextFilter(unittest.TestCase):
         self.assertEqual(result[0]["role"], "user")
         self.assertEqual(result[0]["content"], "mode=debate What is the future of AI?")
     
+    def test_malformed_mention_preserved(self):
+        """Test that text only resembling a mention is left in place"""
+        for text in ("<@> hi", "<@U1 2> hi", "<@U12345 hi", "<@U-1> hi"):
+            self.assertEqual(self.filter.remove_bot_mention(text), text)
+    
+    def test_clean_user_message_is_memoized(self):
+        """Test that repeated texts are served from the cleaning cache"""
+        text = "<@BOT123> model=gpt mode=debate  Cache   me"
+        first = self.filter.clean_user_message(text)
+        hits = ContextFilter._clean_text.cache_info().hits
+        
+        self.assertEqual(self.filter.clean_user_message(text), "Cache me")
+        self.assertEqual(first, "Cache me")
+        self.assertEqual(ContextFilter._clean_text.cache_info().hits, hits + 1)
+    
     def test_message_without_mention(self):
         """Test that messages without mentions are not affected"""
         messages = [
@@ -212,6 +227,23 @@ class TestContextFilter(unittest.TestCase):
         self.assertEqual(result[0]["content"], "You are a helpful assistant")
         self.assertEqual(result[1]["role"], "user")
 
+    def test_prepared_context_matches_per_model_filtering(self):
+        """Test that a shared prepared context yields the same prompts"""
+        messages = [
+            {"text": "<@BOT123> Compare these", "user": "U123"},
+            {"text": "GPT answer", "bot_id": "B123", "username": "GPT-4o"},
+            {"text": "Gemini answer", "bot_id": "B123", "username": "Gemini-2.0-Flash"}
+        ]
+
+        prepared = self.filter.prepare_context(messages)
+
+        for username in ("GPT-4o", "Gemini-2.0-Flash"):
+            for mode in ("compare", "debate"):
+                self.assertEqual(
+                    self.filter.build_prompt_from_prepared(prepared, username, "sys", mode),
+                    self.filter.build_prompt_with_context(messages, username, "sys", mode)
+                )
+
 
 class TestSystemPrompt(unittest.TestCase):
     """Test cases for system prompt generation"""
@@ -230,6 +262,13 @@ class TestSystemPrompt(unittest.TestCase):
         self.assertIn("Gemini", prompt)
         self.assertIn("debate", prompt.lower())
     
+    def test_prompt_is_memoized(self):
+        """Test that repeated calls reuse the same prompt string"""
+        first = create_default_system_prompt("Grok", "debate", "Judge")
+        second = create_default_system_prompt("Grok", "debate", "Judge")
+        
+        self.assertIs(first, second)
+    
     def test_unknown_mode_prompt(self):
         """Test system prompt for unknown mode"""
         prompt = create_default_system_prompt("Grok", "unknown")
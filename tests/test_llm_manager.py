@@ -5,14 +5,34 @@ Note: These tests focus on the structure and initialization logic.
 API integration tests are excluded to avoid requiring actual API keys.
 """
 
+import contextlib
 import unittest
+from importlib.util import find_spec
 from unittest.mock import patch, MagicMock
 import os
 
 
+def _has_module(name):
+    try:
+        return find_spec(name) is not None
+    except ModuleNotFoundError:
+        return False
+
+
+# Provider SDKs are optional; tests that build their adapters skip without them
+HAS_OPENAI = _has_module("openai")
+HAS_GENAI = _has_module("google.genai")
+HAS_XAI = _has_module("xai_sdk")
+
+requires_openai = unittest.skipUnless(HAS_OPENAI, "openai not installed")
+requires_genai = unittest.skipUnless(HAS_GENAI, "google-genai not installed")
+requires_xai = unittest.skipUnless(HAS_XAI, "xai-sdk not installed")
+
+
 class TestLLMManager(unittest.TestCase):
     """Test cases for LLMManager class"""
     
+    @unittest.skipUnless(HAS_OPENAI and HAS_GENAI and HAS_XAI, "provider SDKs not installed")
     @patch.dict(os.environ, {
         'OPENAI_API_KEY': 'test-openai-key',
         'GOOGLE_API_KEY': 'test-google-key',
@@ -41,6 +61,7 @@ class TestLLMManager(unittest.TestCase):
         # Should have no adapters
         self.assertEqual(len(manager.get_adapter_names()), 0)
     
+    @requires_openai
     @patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key'})
     def test_get_adapter(self):
         """Test getting a specific adapter"""
@@ -62,6 +83,7 @@ class TestLLMManager(unittest.TestCase):
         with self.assertRaises(KeyError):
             manager.get_adapter("nonexistent")
     
+    @requires_openai
     @patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key'})
     def test_get_all_adapters(self):
         """Test getting all adapters"""
@@ -70,9 +92,50 @@ class TestLLMManager(unittest.TestCase):
         manager = LLMManager()
         adapters = manager.get_all_adapters()
         
-        self.assertIsInstance(adapters, list)
+        self.assertIsInstance(adapters, tuple)
+        self.assertIs(manager.get_all_adapters(), adapters)
         self.assertEqual(len(adapters), 1)  # Only OpenAI key provided
     
+    @requires_openai
+    @patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key'})
+    def test_get_adapters_skips_unknown(self):
+        """Test batch lookup returns only configured adapters"""
+        from llm_manager import LLMManager
+        
+        manager = LLMManager()
+        adapters = manager.get_adapters(["nonexistent", "openai"])
+        
+        self.assertEqual([a.adapter_key for a in adapters], ["openai"])
+    
+    @requires_openai
+    @patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key', 'OPENAI_USERNAME': 'GPT-5.2'})
+    def test_get_username_mapping(self):
+        """Test that the username mapping is built once and rebuilt on registration"""
+        from llm_manager import LLMManager
+        
+        manager = LLMManager()
+        mapping = manager.get_username_mapping()
+        
+        self.assertEqual(mapping, {"GPT-5.2": "openai"})
+        self.assertIs(manager.get_username_mapping(), mapping)
+        
+        adapter = MagicMock(username="Other")
+        manager.register_adapter("other", adapter)
+        self.assertEqual(manager.get_username_mapping()["Other"], "other")
+    
+    @requires_openai
+    @patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key', 'OPENAI_USERNAME': 'GPT-5.2'})
+    def test_find_adapter_key_ignores_case(self):
+        """Test resolving a typed model name to its adapter key"""
+        from llm_manager import LLMManager
+        
+        manager = LLMManager()
+        
+        self.assertEqual(manager.find_adapter_key("GPT-5.2"), "openai")
+        self.assertEqual(manager.find_adapter_key("gpt-5.2"), "openai")
+        self.assertIsNone(manager.find_adapter_key("Unknown"))
+    
+    @requires_openai
     @patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key'})
     def test_adapter_display_config(self):
         """Test adapter display configuration"""
@@ -82,14 +145,19 @@ class TestLLMManager(unittest.TestCase):
         adapter = manager.get_adapter("openai")
         config = adapter.get_display_config()
         
-        self.assertIn("username", config)
-        self.assertIn("icon_emoji", config)
-        self.assertEqual(config["username"], "GPT-5.2")
+        self.assertEqual(config, {"username": "GPT-5.2", "icon_emoji": adapter.icon_emoji})
+        self.assertIs(adapter.get_display_config(), config)
+        with self.assertRaises(TypeError):
+            config["username"] = "Other"
+        
+        adapter.icon_emoji = ":robot_face:"
+        self.assertEqual(adapter.get_display_config()["icon_emoji"], ":robot_face:")
 
 
 class TestAdapterStructure(unittest.TestCase):
     """Test adapter structure and interface"""
     
+    @requires_openai
     @patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key'})
     def test_openai_adapter_structure(self):
         """Test OpenAI adapter structure"""
@@ -101,6 +169,7 @@ class TestAdapterStructure(unittest.TestCase):
         self.assertEqual(adapter.username, "GPT-5.2")
         self.assertEqual(adapter.icon_emoji, ":robot_face:")
     
+    @requires_genai
     @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test-key'})
     def test_gemini_adapter_structure(self):
         """Test Gemini adapter structure"""
@@ -112,6 +181,7 @@ class TestAdapterStructure(unittest.TestCase):
         self.assertEqual(adapter.username, "Gemini-3-Flash-Preview")
         self.assertEqual(adapter.icon_emoji, ":gem:")
     
+    @requires_xai
     @patch.dict(os.environ, {'XAI_API_KEY': 'test-key'})
     def test_grok_adapter_structure(self):
         """Test Grok adapter structure"""
@@ -123,6 +193,7 @@ class TestAdapterStructure(unittest.TestCase):
         self.assertEqual(adapter.username, "Grok-3")
         self.assertEqual(adapter.icon_emoji, ":lightning:")
     
+    @requires_openai
     @patch.dict(os.environ, {'DOUBAO_API_KEY': 'test-key'})
     def test_doubao_adapter_structure(self):
         """Test Doubao adapter structure"""
@@ -142,45 +213,387 @@ class TestAdapterStructure(unittest.TestCase):
             with self.assertRaises(ValueError):
                 OpenAIAdapter()
 
+    def test_adapter_classes_register_by_key(self):
+        """Test that adapter classes register themselves and duplicates are skipped"""
+        from llm_manager import ADAPTER_CLASSES, LLMAdapter, OpenAIAdapter
+        
+        self.assertIs(ADAPTER_CLASSES["openai"], OpenAIAdapter)
+        
+        with self.assertLogs("llm_manager", level="WARNING"):
+            class DuplicateAdapter(LLMAdapter):
+                adapter_key = "openai"
+        
+        self.assertIs(ADAPTER_CLASSES["openai"], OpenAIAdapter)
+
 
-class TestOpenAIParameterUpdate(unittest.TestCase):
+@requires_openai
+class TestOpenAIParameterUpdate(unittest.IsolatedAsyncioTestCase):
     """Test OpenAI API parameter compatibility"""
     
     @patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key'})
-    def test_openai_uses_max_completion_tokens(self):
+    async def test_openai_uses_max_completion_tokens(self):
         """Test that OpenAI adapter uses max_completion_tokens parameter for GPT-5.2"""
         from llm_manager import OpenAIAdapter
-        from unittest.mock import AsyncMock, MagicMock, patch
-        import asyncio
+        from unittest.mock import AsyncMock
         
-        async def run_test():
-            adapter = OpenAIAdapter()
+        adapter = OpenAIAdapter()
+        
+        # Mock the OpenAI client
+        mock_response = MagicMock()
+        mock_response.choices = [MagicMock()]
+        mock_response.choices[0].message.content = "Test response"
+        
+        mock_client = MagicMock()
+        mock_client.chat.completions.create = AsyncMock(return_value=mock_response)
+        
+        # Patch AsyncOpenAI where llm_manager imports it
+        with patch('llm_manager.AsyncOpenAI', return_value=mock_client):
+            messages = [{"role": "user", "content": "Hello"}]
+            result = await adapter.generate_response(messages)
             
-            # Mock the OpenAI client
-            mock_response = MagicMock()
-            mock_response.choices = [MagicMock()]
-            mock_response.choices[0].message.content = "Test response"
+            # Verify the correct parameter was used
+            mock_client.chat.completions.create.assert_called_once()
+            call_kwargs = mock_client.chat.completions.create.call_args[1]
             
-            mock_client = MagicMock()
-            mock_client.chat.completions.create = AsyncMock(return_value=mock_response)
+            # Assert max_completion_tokens is used, not max_tokens
+            self.assertIn('max_completion_tokens', call_kwargs)
+            self.assertNotIn('max_tokens', call_kwargs)
+            self.assertEqual(call_kwargs['max_completion_tokens'], 1000)
+            self.assertEqual(result, "Test response")
+    
+    @patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key'})
+    async def test_openai_returns_message_after_reasoning(self):
+        """Test that the message item is picked out of the Responses API output"""
+        from llm_manager import OpenAIAdapter
+        from unittest.mock import AsyncMock
+        
+        adapter = OpenAIAdapter()
+        reasoning = MagicMock(type="reasoning")
+        message = MagicMock(type="message")
+        message.content = [MagicMock(text="Test response")]
+        
+        mock_client = MagicMock()
+        mock_client.responses.create = AsyncMock(return_value=MagicMock(output=[reasoning, message]))
+        adapter._client = mock_client
+        
+        result = await adapter.generate_response([{"role": "user", "content": "Hello"}])
+        
+        self.assertEqual(result, "Test response")
+    
+    @patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key'})
+    async def test_openai_stream_error_is_marked(self):
+        """Test that a failed stream yields ErrorResponse after its partial deltas"""
+        from llm_manager import OpenAIAdapter, ErrorResponse
+        from unittest.mock import AsyncMock
+        
+        async def events():
+            yield MagicMock(type="response.output_text.delta", delta="Half")
+            raise ConnectionError("connection reset")
+        
+        adapter = OpenAIAdapter()
+        adapter._client = MagicMock()
+        adapter._client.responses.create = AsyncMock(return_value=events())
+        
+        deltas = [delta async for delta in adapter.stream_response([{"role": "user", "content": "Hello"}])]
+        
+        self.assertEqual(deltas[0], "Half")
+        self.assertNotIsInstance(deltas[0], ErrorResponse)
+        self.assertIsInstance(deltas[1], ErrorResponse)
+        self.assertIn("connection reset", deltas[1])
+    
+    @patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key'})
+    async def test_openai_stream_yields_empty_delta_for_progress(self):
+        """Test that reasoning and search events surface as empty deltas"""
+        from llm_manager import OpenAIAdapter
+        from unittest.mock import AsyncMock
+        
+        async def events():
+            yield MagicMock(type="response.reasoning_summary_text.delta")
+            yield MagicMock(type="response.web_search_call.searching")
+            yield MagicMock(type="response.output_text.delta", delta="Hi")
+        
+        adapter = OpenAIAdapter()
+        adapter._client = MagicMock()
+        adapter._client.responses.create = AsyncMock(return_value=events())
+        
+        deltas = [delta async for delta in adapter.stream_response([{"role": "user", "content": "Hello"}])]
+        
+        self.assertEqual(deltas, ["", "", "Hi"])
+    
+    @patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key'})
+    async def test_openai_stream_failure_events_are_marked(self):
+        """Test that failed, incomplete and error events end the stream with ErrorResponse"""
+        from llm_manager import OpenAIAdapter, ErrorResponse
+        from unittest.mock import AsyncMock
+        
+        failed = MagicMock(type="response.failed")
+        failed.response.error.message = "server overloaded"
+        incomplete = MagicMock(type="response.incomplete")
+        incomplete.response.incomplete_details.reason = "max_output_tokens"
+        error = MagicMock(type="error", message="rate limited")
+        
+        for event, expected in ((failed, "server overloaded"),
+                                (incomplete, "max_output_tokens"),
+                                (error, "rate limited")):
+            async def events():
+                yield MagicMock(type="response.output_text.delta", delta="Half")
+                yield event
+                yield MagicMock(type="response.output_text.delta", delta="ignored")
             
-            # Patch AsyncOpenAI from the openai module, not llm_manager
-            with patch('openai.AsyncOpenAI', return_value=mock_client):
-                messages = [{"role": "user", "content": "Hello"}]
-                result = await adapter.generate_response(messages)
-                
-                # Verify the correct parameter was used
-                mock_client.chat.completions.create.assert_called_once()
-                call_kwargs = mock_client.chat.completions.create.call_args[1]
-                
-                # Assert max_completion_tokens is used, not max_tokens
-                self.assertIn('max_completion_tokens', call_kwargs)
-                self.assertNotIn('max_tokens', call_kwargs)
-                self.assertEqual(call_kwargs['max_completion_tokens'], 1000)
-                self.assertEqual(result, "Test response")
-        
-        # Run the async test
-        asyncio.run(run_test())
+            adapter = OpenAIAdapter()
+            adapter._client = MagicMock()
+            adapter._client.responses.create = AsyncMock(return_value=events())
+            
+            deltas = [delta async for delta in adapter.stream_response([{"role": "user", "content": "Hello"}])]
+            
+            self.assertEqual(len(deltas), 2, event.type)
+            self.assertEqual(deltas[0], "Half")
+            self.assertIsInstance(deltas[1], ErrorResponse)
+            self.assertIn(expected, deltas[1])
+    
+    @patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key'})
+    def test_openai_prompt_cache_key_follows_system_prompt(self):
+        """Test that requests sharing a system prompt share a prompt cache key"""
+        from llm_manager import OpenAIAdapter
+        
+        adapter = OpenAIAdapter()
+        first = adapter._build_request([
+            {"role": "system", "content": "sys"}, {"role": "user", "content": "A"}
+        ])
+        second = adapter._build_request([
+            {"role": "system", "content": "sys"}, {"role": "user", "content": "B"}
+        ])
+        
+        self.assertEqual(first["prompt_cache_key"], second["prompt_cache_key"])
+        self.assertNotIn("prompt_cache_key", adapter._build_request([{"role": "user", "content": "A"}]))
+
+
+class TestProviderSemaphore(unittest.TestCase):
+    """Test cases for per-provider LLM concurrency limits"""
+    
+    @patch.dict(os.environ, {}, clear=True)
+    def test_adapters_of_one_provider_share_a_semaphore(self):
+        """Test that a provider's limit applies across its adapters"""
+        from llm_manager import LLMManager
+        
+        manager = LLMManager()
+        first = MagicMock(provider="openai", adapter_key="openai")
+        second = MagicMock(provider="openai", adapter_key="openai-mini")
+        
+        self.assertIs(manager.provider_semaphore(first), manager.provider_semaphore(second))
+    
+    @patch.dict(os.environ, {}, clear=True)
+    def test_providers_are_limited_independently(self):
+        """Test that each provider gets its own configured limit"""
+        import asyncio
+        from llm_manager import LLMManager, PROVIDER_CONCURRENCY, DEFAULT_PROVIDER_CONCURRENCY
+        
+        manager = LLMManager(provider_limits={"xai": 2})
+        openai = MagicMock(provider="openai")
+        xai = MagicMock(provider="xai")
+        other = MagicMock(provider=None, adapter_key="unknown")
+        
+        async def run():
+            await self._assert_limit(manager, xai, 2)
+            await self._assert_limit(manager, openai, PROVIDER_CONCURRENCY["openai"])
+            await self._assert_limit(manager, other, DEFAULT_PROVIDER_CONCURRENCY)
+            # A provider at its limit never holds up another provider
+            async with self._hold(manager, openai, PROVIDER_CONCURRENCY["openai"]):
+                await self._enter(manager, other)
+        
+        asyncio.run(asyncio.wait_for(run(), timeout=1))
+    
+    @patch.dict(os.environ, {}, clear=True)
+    def test_global_limit_spans_providers(self):
+        """Test that concurrency_limit caps requests across different providers"""
+        import asyncio
+        from llm_manager import LLMManager
+        
+        manager = LLMManager(concurrency_limit=1)
+        openai = MagicMock(provider="openai")
+        google = MagicMock(provider="google")
+        
+        async def run():
+            async with manager.request_slot(openai):
+                waiter = asyncio.create_task(self._enter(manager, google))
+                await asyncio.sleep(0)
+                self.assertFalse(waiter.done())
+            await asyncio.wait_for(waiter, timeout=1)
+        
+        asyncio.run(run())
+    
+    @patch.dict(os.environ, {}, clear=True)
+    def test_generate_response_holds_provider_slot(self):
+        """Test that manager-level calls are bounded by the provider limit"""
+        import asyncio
+        from unittest.mock import AsyncMock
+        from llm_manager import LLMManager
+        
+        manager = LLMManager(provider_limits={"openai": 1})
+        adapter = MagicMock(provider="openai", username="GPT")
+        manager.register_adapter("openai", adapter)
+        
+        async def run():
+            async with manager.request_slot(adapter):
+                adapter.generate_response = AsyncMock(return_value="ok")
+                call = asyncio.create_task(manager.generate_response("openai", []))
+                await asyncio.sleep(0)
+                adapter.generate_response.assert_not_awaited()
+            self.assertEqual(await asyncio.wait_for(call, timeout=1), "ok")
+        
+        asyncio.run(run())
+    
+    @staticmethod
+    async def _enter(manager, adapter):
+        async with manager.request_slot(adapter):
+            pass
+    
+    @staticmethod
+    @contextlib.asynccontextmanager
+    async def _hold(manager, adapter, count):
+        async with contextlib.AsyncExitStack() as stack:
+            for _ in range(count):
+                await stack.enter_async_context(manager.request_slot(adapter))
+            yield
+    
+    async def _assert_limit(self, manager, adapter, limit):
+        """Check that limit slots can be held at once and one more has to wait"""
+        import asyncio
+        
+        async with self._hold(manager, adapter, limit):
+            waiter = asyncio.ensure_future(self._enter(manager, adapter))
+            await asyncio.sleep(0)
+            self.assertFalse(waiter.done())
+        await asyncio.wait_for(waiter, timeout=1)
+
+
+@requires_openai
+class TestWarmup(unittest.TestCase):
+    """Test cases for adapter warmup at startup"""
+    
+    @patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key'})
+    def test_warmup_opens_connection_and_client(self):
+        """Test that warmup creates the SDK client and pre-connects to base_url"""
+        import asyncio
+        from unittest.mock import AsyncMock
+        from llm_manager import OpenAIAdapter, WARMUP_TIMEOUT
+        
+        adapter = OpenAIAdapter()
+        adapter.http_client = MagicMock()
+        adapter.http_client.head = AsyncMock()
+        
+        with patch('llm_manager.AsyncOpenAI') as mock_openai:
+            asyncio.run(adapter.warmup())
+        
+        mock_openai.assert_called_once()
+        adapter.http_client.head.assert_awaited_once_with(adapter.base_url, timeout=WARMUP_TIMEOUT)
+    
+    @patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key'})
+    def test_warmup_all_swallows_failures(self):
+        """Test that a failed warmup never stops startup"""
+        import asyncio
+        from unittest.mock import AsyncMock
+        from llm_manager import LLMManager
+        
+        http_client = MagicMock()
+        http_client.head = AsyncMock(side_effect=OSError("unreachable"))
+        manager = LLMManager(http_client=http_client)
+        
+        with patch('llm_manager.AsyncOpenAI'):
+            asyncio.run(manager.warmup_all())
+        
+        http_client.head.assert_awaited_once()
+
+
+class TestClose(unittest.TestCase):
+    """Test cases for closing adapter clients at shutdown"""
+    
+    @requires_xai
+    @patch.dict(os.environ, {'XAI_API_KEY': 'test-key'})
+    def test_aclose_closes_owned_client(self):
+        """Test that a client with its own transport is closed and dropped"""
+        import asyncio
+        from unittest.mock import AsyncMock
+        from llm_manager import GrokAdapter
+        
+        adapter = GrokAdapter()
+        client = MagicMock(spec=["close"])
+        client.close = AsyncMock()
+        adapter._client = client
+        
+        asyncio.run(adapter.aclose())
+        
+        client.close.assert_awaited_once()
+        self.assertIsNone(adapter._client)
+    
+    @requires_openai
+    @patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key'})
+    def test_aclose_leaves_shared_http_client_open(self):
+        """Test that clients built on the shared http_client are only dropped"""
+        import asyncio
+        from unittest.mock import AsyncMock
+        from llm_manager import OpenAIAdapter
+        
+        adapter = OpenAIAdapter()
+        adapter.http_client = MagicMock()
+        client = MagicMock()
+        client.close = AsyncMock()
+        adapter._client = client
+        
+        asyncio.run(adapter.aclose())
+        
+        client.close.assert_not_awaited()
+        self.assertIsNone(adapter._client)
+
+
+class TestSharedHttpClient(unittest.TestCase):
+    """Test connection reuse across adapter calls"""
+    
+    @requires_openai
+    @patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key', 'DOUBAO_API_KEY': 'test-key'})
+    def test_manager_passes_http_client_to_adapters(self):
+        """Test that every adapter receives the shared HTTP client"""
+        from llm_manager import LLMManager
+        
+        http_client = MagicMock()
+        manager = LLMManager(http_client=http_client)
+        
+        for adapter in manager.get_all_adapters():
+            self.assertIs(adapter.http_client, http_client)
+    
+    @requires_openai
+    @patch.dict(os.environ, {'OPENAI_API_KEY': 'test-key'})
+    def test_openai_client_is_created_once(self):
+        """Test that the SDK client is reused across calls"""
+        from llm_manager import OpenAIAdapter
+        
+        adapter = OpenAIAdapter()
+        adapter.http_client = MagicMock()
+        
+        with patch('llm_manager.AsyncOpenAI') as mock_openai:
+            first = adapter._get_client()
+            second = adapter._get_client()
+        
+        self.assertIs(first, second)
+        mock_openai.assert_called_once_with(api_key='test-key', http_client=adapter.http_client)
+    
+    @requires_genai
+    @patch.dict(os.environ, {'GOOGLE_API_KEY': 'test-key'})
+    def test_gemini_uses_shared_http_client(self):
+        """Test that Gemini's async transport is the shared HTTP client"""
+        import asyncio
+        import httpx
+        from llm_manager import GeminiAdapter
+        
+        adapter = GeminiAdapter()
+        http_client = adapter.http_client = httpx.AsyncClient()
+        self.addCleanup(lambda: asyncio.run(http_client.aclose()))
+        
+        with patch('llm_manager.genai') as mock_genai:
+            adapter._get_client()
+        
+        http_options = mock_genai.Client.call_args.kwargs["http_options"]
+        self.assertIs(http_options.httpx_async_client, adapter.http_client)
 
 
 if __name__ == "__main__":
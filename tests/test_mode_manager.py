@@ -43,6 +43,15 @@ class TestModeCommand(unittest.TestCase):
         
         self.assertEqual(result, {})
     
+    def test_extract_inline_mode_empty_text(self):
+        """Test that empty text has no inline mode"""
+        self.assertEqual(ModeCommand.extract_inline_mode(""), {})
+    
+    def test_extract_mode_defaults_to_compare(self):
+        """Test that text without a mode is returned unchanged"""
+        self.assertEqual(ModeCommand.extract_mode("What is AI?"), ("What is AI?", "compare"))
+        self.assertEqual(ModeCommand.extract_mode("mode=debate Why?"), ("Why?", "debate"))
+    
     def test_extract_inline_mode_invalid_mode(self):
         """Test extracting inline mode with invalid mode"""
         result = ModeCommand.extract_inline_mode("mode=invalid What is AI?")